@@ -1,5 +1,11 @@
 from __future__ import annotations
 
+from typing import Any, Awaitable, Callable, Dict
+
+from fastapi import Request
+from fastapi.exceptions import RequestValidationError
+from pydantic import TypeAdapter, ValidationError
+
 from .config import settings
 from .services.download_manager import DownloadManager
 
@@ -10,3 +16,56 @@ def get_download_manager() -> DownloadManager:
     return download_manager
 
 
+def json_body(model: Any) -> Callable[[Request], Awaitable[Any]]:
+    """Body dependency that parses and validates raw JSON in a single pydantic-core pass.
+
+    ``model`` may be a pydantic model or any type pydantic can validate,
+    e.g. a discriminated union.
+
+    Use for large payloads (batch URLs, whole queues) instead of a plain body
+    parameter, which goes through json.loads and then model_validate.
+    """
+
+    adapter = TypeAdapter(model)
+
+    async def dependency(request: Request) -> Any:
+        try:
+            return adapter.validate_json(await request.body())
+        except ValidationError as e:
+            raise RequestValidationError(
+                [{**err, "loc": ("body", *err["loc"])} for err in e.errors(include_url=False)]
+            ) from e
+
+    return dependency
+
+
+def json_body_openapi(model: Any) -> Dict[str, Any]:
+    """``openapi_extra`` documenting the request body of a json_body route.
+
+    FastAPI can't see a body behind a dependency, so pass this to the route
+    decorator to keep the schema in /docs. Nested ``$defs`` are inlined since
+    they have no home under ``components`` here.
+    """
+    schema = TypeAdapter(model).json_schema()
+    defs = schema.pop("$defs", {})
+
+    def inline(node: Any) -> Any:
+        if isinstance(node, dict):
+            ref = node.get("$ref")
+            if isinstance(ref, str) and ref.startswith("#/$defs/"):
+                return inline(defs[ref[len("#/$defs/"):]])
+            out = {k: inline(v) for k, v in node.items()}
+            if isinstance(out.get("discriminator"), dict):
+                # mapping values point into $defs; oneOf is inlined instead
+                out["discriminator"].pop("mapping", None)
+            return out
+        if isinstance(node, list):
+            return [inline(v) for v in node]
+        return node
+
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {"application/json": {"schema": inline(schema)}},
+        }
+    }
@@ -5,17 +5,41 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 import os
+import logging
+import logging.handlers
 from pathlib import Path
 
 from .config import settings
 from .routes import info, auth, profiles, streaming, downloads, library, playlists, analytics, queue, party
 from .database import init_db, get_db
 from .services.stream_manager import stream_manager
+from .services.cookie_helper import extract_cookies_to_file
 
 
 import asyncio
 
 
+def _configure_logging() -> None:
+    """Route app.* loggers through a buffered handler.
+
+    Debug chatter from the streaming paths is batched in memory and written
+    out 1024 records at a time; any INFO or higher record flushes the buffer
+    immediately, so lifecycle messages and failures still show up right away.
+    """
+    app_logger = logging.getLogger("app")
+    if app_logger.handlers:
+        return
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter("%(message)s"))
+    app_logger.addHandler(logging.handlers.MemoryHandler(
+        capacity=1024,
+        flushLevel=logging.INFO,
+        target=stream_handler,
+    ))
+    app_logger.setLevel(logging.DEBUG if settings.debug else logging.INFO)
+    app_logger.propagate = False
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # 1. Initialize database
@@ -25,14 +49,25 @@ async def lifespan(app: FastAPI):
     import yt_dlp
     print(f"📦 [SYSTEM] yt-dlp version: {yt_dlp.version.__version__}")
     
-    # 3. Start Persistent Stream Manager (Warms up yt-dlp)
-    asyncio.create_task(stream_manager.start())
+    # 3. Warm the cookie file in a worker thread so no request pays for
+    #    browser cookie extraction on the serving path
+    cookie_warmup = asyncio.create_task(asyncio.to_thread(extract_cookies_to_file))
+    
+    # 4. Start Persistent Stream Manager (Warms up yt-dlp once cookies are ready)
+    asyncio.create_task(stream_manager.start(cookies_ready=cookie_warmup))
         
     yield
-    # Shutdown: cleanup if needed
+    # Shutdown: stop extraction workers and downloads, close pooled clients, then write out buffered log records
+    await stream_manager.stop()
+    downloads.download_manager.shutdown()
+    info.client.close()
+    for handler in logging.getLogger("app").handlers:
+        handler.flush()
 
 
 def create_app() -> FastAPI:
+    _configure_logging()
+
     app = FastAPI(
         title=settings.app_name, 
         version="0.1.0",
@@ -11,6 +11,7 @@ from typing import Optional
 
 from app.database import get_db
 from app.services.auth_service import AuthService
+from app.schemas import TrustedModel
 
 router = APIRouter(prefix="/api/auth", tags=["Authentication"])
 security = HTTPBearer(auto_error=False)
@@ -36,7 +37,7 @@ class TokenResponse(BaseModel):
     username: str
 
 
-class UserResponse(BaseModel):
+class UserResponse(TrustedModel):
     id: int
     username: str
     email: str
@@ -46,7 +47,7 @@ class UserResponse(BaseModel):
         from_attributes = True
 
 
-class ProfileResponse(BaseModel):
+class ProfileResponse(TrustedModel):
     id: int
     name: str
     avatar_url: Optional[str] = None
@@ -208,12 +209,7 @@ async def login(request: LoginRequest, db: AsyncSession = Depends(get_db)):
 @router.get("/me", response_model=UserResponse)
 async def get_me(user = Depends(get_current_user)):
     """Get current authenticated user"""
-    return UserResponse(
-        id=user.id,
-        username=user.username,
-        email=user.email,
-        is_admin=user.is_admin
-    )
+    return UserResponse.from_orm_trusted(user)
 
 
 @router.post("/refresh", response_model=TokenResponse)
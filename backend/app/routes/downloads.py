@@ -2,15 +2,17 @@
 Onyx - Downloads Routes
 Handles download operations and local library management
 """
+import asyncio
 import subprocess
 import os
 from pathlib import Path
-from fastapi import APIRouter, HTTPException, Header
+from fastapi import APIRouter, Depends, HTTPException, Header
 from fastapi.responses import FileResponse
 from typing import Optional
 import mimetypes
 
-from ..schemas import DownloadRequest
+from ..schemas import BatchDownloadRequest, DownloadRequest
+from ..dependencies import json_body, json_body_openapi
 from ..services.download_manager import DownloadManager
 from ..config import settings
 
@@ -33,24 +35,14 @@ async def start_download(request: DownloadRequest):
         raise HTTPException(status_code=500, detail=str(e)) from e
 
 
-from pydantic import BaseModel
-from typing import List
-
-class BatchDownloadRequest(BaseModel):
-    urls: List[str]
-    format: str = "audio"
-    quality: str = "best"
-    folder_name: Optional[str] = None
-
-
-@router.post("/downloads/batch")
-async def start_batch_download(request: BatchDownloadRequest):
+@router.post("/downloads/batch", openapi_extra=json_body_openapi(BatchDownloadRequest))
+async def start_batch_download(request: BatchDownloadRequest = Depends(json_body(BatchDownloadRequest))):
     """Start multiple download tasks at once (for playlists)."""
     try:
         task_ids = []
         for url in request.urls:
-            # Create a download request for each URL
-            single_request = DownloadRequest(
+            # URLs were validated once at ingress; skip re-validating each one
+            single_request = DownloadRequest.model_construct(
                 url=url,
                 format=request.format,
                 quality=request.quality,
@@ -99,7 +91,8 @@ async def cancel_download(task_id: str):
 async def list_library():
     """List all downloaded files in the library."""
     try:
-        files = download_manager.list_files()
+        # Directory walk + stats are blocking syscalls; keep them off the loop
+        files = await asyncio.to_thread(download_manager.list_files)
         return files
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e)) from e
@@ -170,8 +163,7 @@ async def get_available_formats(video_id: str):
     Probe available audio/video formats WITHOUT downloading.
     Returns format options with estimated file sizes.
     """
-    import yt_dlp
-    from ..services.cookie_helper import get_yt_dlp_cookie_opts
+    from ..services.cookie_helper import get_yt_dlp_cookie_opts, arun_yt_dlp_with_fallback
     
     ydl_opts = {
         "quiet": True,
@@ -181,11 +173,9 @@ async def get_available_formats(video_id: str):
     ydl_opts.update(get_yt_dlp_cookie_opts())
     
     try:
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(
-                f"https://youtube.com/watch?v={video_id}",
-                download=False
-            )
+        info = await arun_yt_dlp_with_fallback(
+            ydl_opts, f"https://youtube.com/watch?v={video_id}"
+        )
         
         # Filter audio-only formats (vcodec='none' means no video track)
         audio_formats = []
@@ -250,7 +240,7 @@ async def get_available_formats(video_id: str):
 async def search_music(query: str, limit: int = 10):
     """Search YouTube for music tracks."""
     try:
-        results = download_manager.search(query, limit)
+        results = await asyncio.to_thread(download_manager.search, query, limit)
         return {"results": results}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e)) from e
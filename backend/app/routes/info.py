@@ -55,8 +55,7 @@ async def trending(refresh: bool = False):
         return _trending_cache["data"]
     
     try:
-        loop = asyncio.get_event_loop()
-        videos = await loop.run_in_executor(None, client.get_trending)
+        videos = await client.get_trending()
         if not videos:
             raise RuntimeError("No trending videos returned.")
         
@@ -115,6 +114,14 @@ async def playlist(payload: PlaylistRequest):
         raise HTTPException(status_code=500, detail=str(exc)) from exc
 
 
+@router.post("/playlists/detailed")
+async def playlist_detailed(payload: PlaylistRequest):
+    try:
+        return await client.get_playlist_detailed(str(payload.url), payload.limit)
+    except Exception as exc:  # noqa: BLE001
+        raise HTTPException(status_code=500, detail=str(exc)) from exc
+
+
 @router.post("/search")
 async def search(payload: SearchRequest):
     try:
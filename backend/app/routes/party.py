@@ -1,7 +1,8 @@
 from fastapi import APIRouter, HTTPException, Depends, status
 from typing import Optional
-from ..schemas import PartySessionState, PartyJoinRequest, PartyActionRequest, QueueTrack
+from ..schemas import PartySessionState, PartyJoinRequest, PartyActionRequest, AddAction, QueueTrack
 from ..services.party_manager import party_manager
+from ..dependencies import json_body, json_body_openapi
 
 router = APIRouter(prefix="/api/party", tags=["Party"])
 
@@ -22,8 +23,13 @@ async def get_party(session_id: str):
         )
     return session.to_state()
 
-@router.post("/{session_id}/sync", response_model=PartySessionState)
-async def sync_party(session_id: str, host_id: str, state: PartySessionState):
+@router.post("/{session_id}/sync", response_model=PartySessionState,
+             openapi_extra=json_body_openapi(PartySessionState))
+async def sync_party(
+    session_id: str,
+    host_id: str,
+    state: PartySessionState = Depends(json_body(PartySessionState)),
+):
     """Sync the full party state (Host only)"""
     # Note: We pass state as body, but PartyManager update_state expects a dict or specific fields
     updated = await party_manager.update_state(session_id, host_id, state.model_dump())
@@ -34,10 +40,11 @@ async def sync_party(session_id: str, host_id: str, state: PartySessionState):
         )
     return updated
 
-@router.post("/{session_id}/add", response_model=PartySessionState)
-async def add_to_party(session_id: str, request: PartyActionRequest):
+@router.post("/{session_id}/add", response_model=PartySessionState,
+             openapi_extra=json_body_openapi(PartyActionRequest))
+async def add_to_party(session_id: str, request: PartyActionRequest = Depends(json_body(PartyActionRequest))):
     """Add a track to the party queue (Guest or Host contributing)"""
-    if request.action != "add" or not request.track:
+    if not isinstance(request, AddAction):
         raise HTTPException(status_code=400, detail="Invalid action or track missing")
     
     updated = await party_manager.add_track(session_id, request.track)
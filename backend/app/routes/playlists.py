@@ -33,16 +33,7 @@ async def list_playlists(
         track_counts[p.id] = count_result.scalar() or 0
     
     return [
-        {
-            "id": p.id,
-            "name": p.name,
-            "description": p.description,
-            "cover_image": p.cover_image,
-            "is_system": p.is_system,
-            "track_count": track_counts.get(p.id, 0),
-            "created_at": p.created_at,
-            "updated_at": p.updated_at
-        }
+        PlaylistResponse.from_orm_trusted(p, track_count=track_counts.get(p.id, 0), tracks=None)
         for p in playlists
     ]
 
@@ -62,7 +53,7 @@ async def create_playlist(
     db.add(playlist)
     await db.commit()
     await db.refresh(playlist)
-    return {**playlist.__dict__, "track_count": 0}
+    return PlaylistResponse.from_orm_trusted(playlist, track_count=0, tracks=None)
 
 @router.get("/{playlist_id}", response_model=PlaylistResponse)
 async def get_playlist(
@@ -86,29 +77,16 @@ async def get_playlist(
     tracks_result = await db.execute(tracks_query)
     playlist_tracks = tracks_result.all()
     
-    tracks_data = []
-    for pt, t in playlist_tracks:
-        tracks_data.append({
-            "id": t.id,
-            "title": t.title,
-            "artist": t.artist,
-            "thumbnail_url": t.thumbnail_url,
-            "duration": t.duration_sec,
-            "position": pt.position,
-            "added_at": pt.added_at
-        })
-    
-    return {
-        "id": playlist.id,
-        "name": playlist.name,
-        "description": playlist.description,
-        "cover_image": playlist.cover_image,
-        "is_system": playlist.is_system,
-        "track_count": len(tracks_data),
-        "created_at": playlist.created_at,
-        "updated_at": playlist.updated_at,
-        "tracks": tracks_data
-    }
+    tracks_data = [
+        PlaylistTrackResponse.from_orm_trusted(
+            t, duration=t.duration_sec, position=pt.position, added_at=pt.added_at
+        )
+        for pt, t in playlist_tracks
+    ]
+    
+    return PlaylistResponse.from_orm_trusted(
+        playlist, track_count=len(tracks_data), tracks=tracks_data
+    )
 
 @router.put("/{playlist_id}", response_model=PlaylistResponse)
 async def update_playlist(
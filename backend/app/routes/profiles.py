@@ -10,6 +10,7 @@ from typing import Optional, List
 from app.database import get_db
 from app.services.auth_service import AuthService
 from app.routes.auth import get_current_user
+from app.schemas import TrustedModel
 
 router = APIRouter(prefix="/api/profiles", tags=["Profiles"])
 
@@ -36,7 +37,7 @@ class VerifyPinRequest(BaseModel):
     pin: str
 
 
-class ProfileResponse(BaseModel):
+class ProfileResponse(TrustedModel):
     id: int
     name: str
     avatar_url: Optional[str] = None
@@ -58,13 +59,7 @@ async def list_profiles(
     profiles = await auth_service.get_user_profiles(user.id)
     
     return [
-        ProfileResponse(
-            id=p.id,
-            name=p.name,
-            avatar_url=p.avatar_url,
-            theme=p.theme,
-            has_pin=bool(p.pin_hash)
-        )
+        ProfileResponse.from_orm_trusted(p, has_pin=bool(p.pin_hash))
         for p in profiles
     ]
 
@@ -92,13 +87,7 @@ async def create_profile(
         avatar_url=request.avatar_url
     )
     
-    return ProfileResponse(
-        id=profile.id,
-        name=profile.name,
-        avatar_url=profile.avatar_url,
-        theme=profile.theme,
-        has_pin=False
-    )
+    return ProfileResponse.from_orm_trusted(profile, has_pin=False)
 
 
 @router.get("/{profile_id}", response_model=ProfileResponse)
@@ -117,13 +106,7 @@ async def get_profile(
             detail="Profile not found"
         )
     
-    return ProfileResponse(
-        id=profile.id,
-        name=profile.name,
-        avatar_url=profile.avatar_url,
-        theme=profile.theme,
-        has_pin=bool(profile.pin_hash)
-    )
+    return ProfileResponse.from_orm_trusted(profile, has_pin=bool(profile.pin_hash))
 
 
 @router.put("/{profile_id}", response_model=ProfileResponse)
@@ -146,13 +129,7 @@ async def update_profile(
     update_data = request.model_dump(exclude_unset=True)
     profile = await auth_service.update_profile(profile_id, **update_data)
     
-    return ProfileResponse(
-        id=profile.id,
-        name=profile.name,
-        avatar_url=profile.avatar_url,
-        theme=profile.theme,
-        has_pin=bool(profile.pin_hash)
-    )
+    return ProfileResponse.from_orm_trusted(profile, has_pin=bool(profile.pin_hash))
 
 
 @router.delete("/{profile_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -2,7 +2,7 @@
 Onyx Streaming - Queue Routes
 Persisted playback queue management per profile
 """
-import json
+import orjson
 from typing import List
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -12,7 +12,11 @@ from datetime import datetime
 from app.database import get_db
 from app.models.user import Profile, ProfileQueue
 from app.routes.auth import get_current_profile
-from app.schemas import QueueStateRequest, QueueStateResponse, QueueTrack, AddTrackRequest
+from app.dependencies import json_body, json_body_openapi
+from app.schemas import (
+    QueueStateRequest, QueueStateResponse, QueueTrack, QueueTrackTD, AddTrackRequest,
+    QUEUE_TRACKS_ADAPTER,
+)
 
 router = APIRouter(prefix="/api/queue", tags=["Queue"])
 
@@ -20,14 +24,14 @@ router = APIRouter(prefix="/api/queue", tags=["Queue"])
 def parse_tracks_json(tracks_json: str) -> List[dict]:
     """Parse tracks JSON safely"""
     try:
-        return json.loads(tracks_json) if tracks_json else []
-    except json.JSONDecodeError:
+        return orjson.loads(tracks_json) if tracks_json else []
+    except orjson.JSONDecodeError:
         return []
 
 
-def serialize_tracks(tracks: List[QueueTrack]) -> str:
+def serialize_tracks(tracks: List[QueueTrackTD]) -> str:
     """Serialize tracks list to JSON"""
-    return json.dumps([t.model_dump() for t in tracks])
+    return QUEUE_TRACKS_ADAPTER.dump_json(tracks).decode()
 
 
 @router.get("", response_model=QueueStateResponse)
@@ -56,7 +60,7 @@ async def get_queue(
         await db.refresh(queue)
     
     tracks_data = parse_tracks_json(queue.tracks_json)
-    tracks = [QueueTrack(**t) for t in tracks_data]
+    tracks = [QueueTrack.from_orm_trusted(t) for t in tracks_data]
     
     return QueueStateResponse(
         tracks=tracks,
@@ -68,9 +72,9 @@ async def get_queue(
     )
 
 
-@router.put("", response_model=QueueStateResponse)
+@router.put("", response_model=QueueStateResponse, openapi_extra=json_body_openapi(QueueStateRequest))
 async def update_queue(
-    request: QueueStateRequest,
+    request: QueueStateRequest = Depends(json_body(QueueStateRequest)),
     profile: Profile = Depends(get_current_profile),
     db: AsyncSession = Depends(get_db)
 ):
@@ -104,7 +108,7 @@ async def update_queue(
     await db.refresh(queue)
     
     tracks_data = parse_tracks_json(queue.tracks_json)
-    tracks = [QueueTrack(**t) for t in tracks_data]
+    tracks = [QueueTrack.from_orm_trusted(t) for t in tracks_data]
     
     return QueueStateResponse(
         tracks=tracks,
@@ -132,7 +136,7 @@ async def add_track_to_queue(
         # Create new queue with single track
         queue = ProfileQueue(
             profile_id=profile.id,
-            tracks_json=serialize_tracks([request.track]),
+            tracks_json=serialize_tracks([request.track.model_dump()]),
             current_index=0
         )
         db.add(queue)
@@ -149,14 +153,14 @@ async def add_track_to_queue(
         else:
             tracks_data.append(new_track)
         
-        queue.tracks_json = json.dumps(tracks_data)
+        queue.tracks_json = orjson.dumps(tracks_data).decode()
         queue.updated_at = datetime.utcnow()
     
     await db.commit()
     await db.refresh(queue)
     
     tracks_data = parse_tracks_json(queue.tracks_json)
-    tracks = [QueueTrack(**t) for t in tracks_data]
+    tracks = [QueueTrack.from_orm_trusted(t) for t in tracks_data]
     
     return QueueStateResponse(
         tracks=tracks,
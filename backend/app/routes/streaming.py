@@ -2,28 +2,33 @@
 Onyx Streaming - Streaming Routes
 High-performance audio streaming with URL caching and optimization.
 """
-from fastapi import APIRouter, Depends, HTTPException, Header, status
-from fastapi.responses import FileResponse, StreamingResponse, RedirectResponse
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, Request, status
+from fastapi.responses import FileResponse, StreamingResponse, RedirectResponse, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from pathlib import Path
 import os
-import anyio
+import random
 import secrets
 import sys
 import asyncio
 import subprocess
+import logging
 from typing import Dict, Optional, List, Any
 from dataclasses import dataclass
 from datetime import datetime, timedelta
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
 import httpx
 
 from app.database import get_db
 from app.models.library import LibraryTrack
 from app.config import settings
-from app.services.cookie_helper import run_yt_dlp_with_fallback, get_yt_dlp_cookie_opts, FAST_EXTRACT_OPTS
+from app.services.cookie_helper import arun_yt_dlp_with_fallback, get_yt_dlp_cookie_opts, FAST_EXTRACT_OPTS
 from app.services.stream_manager import stream_manager
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(prefix="/api/streaming", tags=["Streaming"])
 
 # Optimized yt-dlp options for FAST extraction
@@ -47,6 +52,111 @@ FAST_YDL_OPTS = {
     "postprocessors": [],
 }
 
+# Invariant option skeletons - built once, merged with cookie opts per request
+_YDL_QUIET = {"quiet": True, "no_warnings": True}
+_YDL_FLAT = {**_YDL_QUIET, "extract_flat": "in_playlist"}
+_YDL_SEARCH = {**_YDL_QUIET, "extract_flat": True}
+_YDL_MIX = {**FAST_EXTRACT_OPTS, "extract_flat": "in_playlist"}
+
+
+def _with_cookies(base: Dict[str, Any]) -> Dict[str, Any]:
+    """Merge a prebuilt option skeleton with the (memoized) cookie/proxy opts."""
+    return {**base, **get_yt_dlp_cookie_opts()}
+
+
+# yt-dlp pipe strategies, tried in order until one yields audio bytes
+_PS5_UA = "Mozilla/5.0 (PlayStation; PlayStation 5/8.20) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.0 Safari/605.1.15"
+_PIPE_STRATEGIES = (
+    {
+        "name": "tv_embedded + ipv4 + cookies",
+        "args": [
+            "--extractor-args", "youtube:player_client=tv_embedded",
+            "--force-ipv4",
+            "--user-agent", _PS5_UA,
+        ],
+        "use_cookies": True,
+    },
+    {
+        "name": "tv_embedded + ipv4 + no cookies",
+        "args": [
+            "--extractor-args", "youtube:player_client=tv_embedded",
+            "--force-ipv4",
+            "--user-agent", _PS5_UA,
+        ],
+        "use_cookies": False,
+    },
+    {
+        "name": "android + ipv4 + cookies",
+        "args": [
+            "--extractor-args", "youtube:player_client=android",
+            "--force-ipv4",
+            "--user-agent", "com.google.android.youtube/19.29.37 (Linux; U; Android 14; en_US) gzip",
+        ],
+        "use_cookies": True,
+    },
+    {
+        "name": "web + ipv4 + cookies",
+        "args": [
+            "--extractor-args", "youtube:player_client=web",
+            "--force-ipv4",
+        ],
+        "use_cookies": True,
+    },
+    {
+        "name": "ios + ipv4 + cookies",
+        "args": [
+            "--extractor-args", "youtube:player_client=ios",
+            "--force-ipv4",
+        ],
+        "use_cookies": True,
+    },
+    {
+        "name": "default + ipv4 + cookies",
+        "args": ["--force-ipv4"],
+        "use_cookies": True,
+    },
+    {
+        "name": "no cookies + ipv4",
+        "args": ["--force-ipv4"],
+        "use_cookies": False,
+    },
+)
+
+# Pipe-mode read size. Large reads mean fewer event-loop wakeups and ASGI
+# sends per MB; the StreamReader limit is raised to match so a single
+# read can drain a full kernel pipe's worth of data.
+_PIPE_CHUNK_SIZE = 256 * 1024
+
+# Request headers for proxied CDN fetches (copied only when a Range is added)
+_BASE_STREAM_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+}
+
+# We MUST forward these headers exactly for range-based media to work
+_PASSTHROUGH_HEADERS = (
+    "Content-Length",
+    "Content-Range",
+    "Accept-Ranges",
+    "Last-Modified",
+    "ETag",
+)
+
+# Leading-byte signatures used to sniff the container yt-dlp piped to us
+_MAGIC = {
+    b"OggS": "audio/ogg",
+    b"\x1aE\xdf\xa3": "audio/webm",
+    b"ID3": "audio/mpeg",
+    b"fLaC": "audio/flac",
+}
+
+# Caps concurrent yt-dlp subprocess spawns so a burst of pipe fallbacks
+# can't fork-storm the box. Slots are held only until the first chunk arrives.
+_YTDLP_SEM = asyncio.Semaphore(settings.max_ytdlp_workers)
+
+async def _extract(opts: Dict[str, Any], url: str) -> Optional[Dict[str, Any]]:
+    """Run run_yt_dlp_with_fallback off the event loop (bounded worker threads)."""
+    return await arun_yt_dlp_with_fallback(opts, url, False)
+
 # =============================================================================
 # 🚀 RECOMMENDATION CACHE - Avoid repeated YouTube calls
 # =============================================================================
@@ -60,8 +170,72 @@ class CachedRecommendation:
     def is_valid(self) -> bool:
         return datetime.now() - self.cached_at < timedelta(hours=self.ttl_hours)
 
-# In-memory cache: video_id -> CachedRecommendation
-_recommendation_cache: Dict[str, CachedRecommendation] = {}
+# In-memory cache: video_id -> CachedRecommendation, LRU-bounded
+_RECOMMENDATION_CACHE_SIZE = 500
+_recommendation_cache: "OrderedDict[str, CachedRecommendation]" = OrderedDict()
+
+
+@dataclass
+class CachedInfo:
+    info: dict
+    cached_at: datetime
+    ttl_hours: int = 6
+
+    def is_valid(self) -> bool:
+        return datetime.now() - self.cached_at < timedelta(hours=self.ttl_hours)
+
+# In-memory cache: video_id -> CachedInfo (shared by /info and /related), LRU-bounded
+_INFO_CACHE_SIZE = 500
+_info_cache: "OrderedDict[str, CachedInfo]" = OrderedDict()
+
+
+def _get_valid(cache: OrderedDict, key: str):
+    """Return a live cache entry or None, dropping it if expired.
+
+    Single lookup + pop(key, None) so concurrent requests can't race on del.
+    """
+    entry = cache.get(key)
+    if entry is None:
+        return None
+    if not entry.is_valid():
+        cache.pop(key, None)
+        return None
+    cache.move_to_end(key)
+    return entry
+
+
+def _put_bounded(cache: OrderedDict, key: str, entry, maxsize: int) -> None:
+    """Insert as most recent and evict least recently used entries past maxsize."""
+    cache[key] = entry
+    cache.move_to_end(key)
+    while len(cache) > maxsize:
+        cache.popitem(last=False)
+
+
+# In-flight extractions keyed by cache key, so concurrent cold-cache requests
+# for the same video share one yt-dlp run instead of each starting their own
+_inflight: Dict[str, asyncio.Task] = {}
+
+
+def _release_inflight(key: str, task: asyncio.Task) -> None:
+    if _inflight.get(key) is task:
+        del _inflight[key]
+    if not task.cancelled():
+        task.exception()  # mark retrieved so a waiter-less failure isn't logged
+
+
+async def _single_flight(key: str, coro_factory):
+    """Run coro_factory() once per key; concurrent callers await the same result.
+
+    The work runs in its own task, so a caller that is cancelled (e.g. its
+    client disconnected) stops waiting without aborting it for the others.
+    """
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(coro_factory())
+        _inflight[key] = task
+        task.add_done_callback(lambda t: _release_inflight(key, t))
+    return await asyncio.shield(task)
 
 
 # =============================================================================
@@ -72,11 +246,14 @@ _recommendation_cache: Dict[str, CachedRecommendation] = {}
 async def stream_track(
     track_id: int,
     range: str = Header(None),
+    if_none_match: Optional[str] = Header(None),
+    if_modified_since: Optional[str] = Header(None),
     db: AsyncSession = Depends(get_db)
 ):
     """
     Stream a library track with byte-range support.
     This allows for instant seeking and better performance in web players.
+    Replays of an unchanged file are answered with 304 Not Modified.
     """
     # 1. Fetch track from DB
     result = await db.execute(
@@ -108,30 +285,62 @@ async def stream_track(
                 detail=f"Audio file not found at {file_path}"
             )
 
-    # 3. Return FileResponse
+    # 3. Conditional GET - let the browser replay from its own cache
+    st = file_path.stat()
+    etag = f'"{st.st_ino:x}-{st.st_mtime_ns:x}-{st.st_size:x}"'
+    cache_headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(st.st_mtime, usegmt=True),
+        "Cache-Control": "private, max-age=86400",
+    }
+    if if_none_match is not None:
+        if etag in (tag.strip() for tag in if_none_match.split(",")) or if_none_match.strip() == "*":
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers)
+    elif if_modified_since:
+        try:
+            if int(st.st_mtime) <= parsedate_to_datetime(if_modified_since).timestamp():
+                return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers)
+        except (TypeError, ValueError):
+            pass
+
+    # 4. Return FileResponse
     return FileResponse(
         path=file_path,
         media_type="audio/mpeg" if file_path.suffix == ".mp3" else "audio/mp4",
-        filename=file_path.name
+        filename=file_path.name,
+        headers=cache_headers,
+        stat_result=st,
     )
 
 
-@router.get("/youtube/{video_id}")
-async def stream_youtube(video_id: str, range: Optional[str] = Header(None)):
+@router.api_route("/youtube/{video_id}", methods=["GET", "HEAD"])
+async def stream_youtube(request: Request, video_id: str, range: Optional[str] = Header(None)):
     """
     Stream YouTube audio with two strategies:
     1. URL extraction + proxy (fast, supports seeking)
     2. yt-dlp pipe fallback (works on datacenter IPs where URL extraction fails)
+
+    HEAD probes are answered from an upstream HEAD when the URL is cached,
+    without pulling any audio; on a cache miss they get an unknown-length
+    answer right away while extraction is queued for the GET that follows.
     """
+    method = request.method
     # Check cache first (instant path)
     cached = stream_manager.get_cached_url(video_id)
     if cached:
-        return await _proxy_stream(cached.url, range, cached.content_type)
+        return await _proxy_stream(cached.url, range, cached.content_type, method)
+
+    if method == "HEAD":
+        # Don't block a probe on a 45s extraction (or spawn yt-dlp for it)
+        await stream_manager.prefetch(video_id, priority=2)
+        response = Response(media_type="audio/mp4", headers={"Cache-Control": "no-cache"})
+        del response.headers["content-length"]  # length unknown, not zero
+        return response
     
     # Strategy 1: Try URL extraction + proxy (supports byte-range seeking)
     try:
         cached = await stream_manager.get_stream_url(video_id, priority=1, timeout=45.0)
-        return await _proxy_stream(cached.url, range, cached.content_type)
+        return await _proxy_stream(cached.url, range, cached.content_type, method)
     except TimeoutError:
         raise HTTPException(
             status_code=504,
@@ -140,19 +349,14 @@ async def stream_youtube(video_id: str, range: Optional[str] = Header(None)):
     except ValueError as e:
         # ValueError = "No progressive audio format available" (datacenter IP blocked)
         # Fall through to pipe-based streaming
-        print(f"⚠️ [STREAM] URL extraction failed for {video_id}, falling back to yt-dlp pipe: {e}")
-        sys.stdout.flush()
+        logger.warning("⚠️ [STREAM] URL extraction failed for %s, falling back to yt-dlp pipe: %s", video_id, e)
     except Exception as e:
-        import traceback
         # Check if it's a format/extraction issue (fall through to pipe)
         err_msg = str(e).lower()
         if "format" in err_msg or "no progressive" in err_msg:
-            print(f"⚠️ [STREAM] Extraction failed for {video_id}, falling back to yt-dlp pipe: {e}")
-            sys.stdout.flush()
+            logger.warning("⚠️ [STREAM] Extraction failed for %s, falling back to yt-dlp pipe: %s", video_id, e)
         else:
-            print(f"❌ [STREAM] Critical error for {video_id}: {str(e)}")
-            print(traceback.format_exc())
-            sys.stdout.flush()
+            logger.exception("❌ [STREAM] Critical error for %s: %s", video_id, e)
             raise HTTPException(
                 status_code=502, 
                 detail=f"Upstream extraction failed for {video_id}: {str(e)}"
@@ -194,96 +398,38 @@ async def _ytdlp_pipe_stream(video_id: str):
         diag_cmd.extend(["--proxy", settings.proxy_url])
     diag_cmd.append(url)
     
-    print(f"🔍 [PIPE] Listing available formats for {video_id}...")
-    sys.stdout.flush()
+    logger.debug("🔍 [PIPE] Listing available formats for %s...", video_id)
     try:
-        diag_proc = await asyncio.create_subprocess_exec(
-            *diag_cmd,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-        )
-        diag_stdout, diag_stderr = await asyncio.wait_for(
-            diag_proc.communicate(), timeout=20.0
-        )
+        async with _YTDLP_SEM:
+            diag_proc = await asyncio.create_subprocess_exec(
+                *diag_cmd,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+            )
+            diag_stdout, diag_stderr = await asyncio.wait_for(
+                diag_proc.communicate(), timeout=20.0
+            )
         diag_output = (diag_stdout or b"").decode(errors="ignore")
         diag_errors = (diag_stderr or b"").decode(errors="ignore")
-        print(f"📋 [PIPE] Available formats for {video_id}:")
-        for line in diag_output.strip().split("\n")[-15:]:  # last 15 lines
-            print(f"  {line}")
-        if diag_errors.strip():
-            print(f"  STDERR: {diag_errors.strip()[:200]}")
-        sys.stdout.flush()
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("📋 [PIPE] Available formats for %s:", video_id)
+            for line in diag_output.strip().split("\n")[-15:]:  # last 15 lines
+                logger.debug("  %s", line)
+            if diag_errors.strip():
+                logger.debug("  STDERR: %s", diag_errors.strip()[:200])
     except Exception as e:
-        print(f"⚠️ [PIPE] Format listing failed: {e}")
-        sys.stdout.flush()
+        logger.warning("⚠️ [PIPE] Format listing failed: %s", e)
     
     # Diagnostic: Print yt-dlp version and proxy status
     import yt_dlp
-    print(f"📦 [PIPE] yt-dlp version: {yt_dlp.version.__version__}")
-    print(f"📦 [PIPE] Proxy active: {bool(settings.proxy_url)}")
-    print(f"📦 [PIPE] Executable path: {sys.executable}")
-    sys.stdout.flush()
+    logger.debug("📦 [PIPE] yt-dlp version: %s", yt_dlp.version.__version__)
+    logger.debug("📦 [PIPE] Proxy active: %s", bool(settings.proxy_url))
+    logger.debug("📦 [PIPE] Executable path: %s", sys.executable)
 
     # Step 2: Try streaming with different strategies
-    strategies = [
-        {
-            "name": "tv_embedded + ipv4 + cookies",
-            "args": [
-                "--extractor-args", "youtube:player_client=tv_embedded",
-                "--force-ipv4",
-                "--user-agent", "Mozilla/5.0 (PlayStation; PlayStation 5/8.20) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.0 Safari/605.1.15",
-            ],
-            "use_cookies": True,
-        },
-        {
-            "name": "tv_embedded + ipv4 + no cookies",
-            "args": [
-                "--extractor-args", "youtube:player_client=tv_embedded",
-                "--force-ipv4",
-                "--user-agent", "Mozilla/5.0 (PlayStation; PlayStation 5/8.20) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.0 Safari/605.1.15",
-            ],
-            "use_cookies": False,
-        },
-        {
-            "name": "android + ipv4 + cookies",
-            "args": [
-                "--extractor-args", "youtube:player_client=android",
-                "--force-ipv4",
-                "--user-agent", "com.google.android.youtube/19.29.37 (Linux; U; Android 14; en_US) gzip",
-            ],
-            "use_cookies": True,
-        },
-        {
-            "name": "web + ipv4 + cookies",
-            "args": [
-                "--extractor-args", "youtube:player_client=web",
-                "--force-ipv4",
-            ],
-            "use_cookies": True,
-        },
-        {
-            "name": "ios + ipv4 + cookies",
-            "args": [
-                "--extractor-args", "youtube:player_client=ios",
-                "--force-ipv4",
-            ],
-            "use_cookies": True,
-        },
-        {
-            "name": "default + ipv4 + cookies",
-            "args": ["--force-ipv4"],
-            "use_cookies": True,
-        },
-        {
-            "name": "no cookies + ipv4",
-            "args": ["--force-ipv4"],
-            "use_cookies": False,
-        },
-    ]
-    
     last_error = "No strategies succeeded"
     
-    for strategy in strategies:
+    for strategy in _PIPE_STRATEGIES:
         cmd = [
             sys.executable, "-m", "yt_dlp",
             "--output", "-",  # pipe to stdout
@@ -311,33 +457,35 @@ async def _ytdlp_pipe_stream(video_id: str):
         
         cmd.append(url)
         
-        print(f"🎵 [PIPE] Strategy: {strategy['name']} for {video_id}")
-        sys.stdout.flush()
+        logger.debug("🎵 [PIPE] Strategy: %s for %s", strategy["name"], video_id)
         
         try:
-            # Start yt-dlp subprocess
-            process = await asyncio.create_subprocess_exec(
-                *cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-            )
-            
-            # Check if process started and has stdout
-            if process.stdout is None:
-                raise RuntimeError("Failed to open yt-dlp stdout pipe")
-            
-            # Read a small chunk first to verify we're getting audio data
-            first_chunk = await asyncio.wait_for(
-                process.stdout.read(8192),
-                timeout=30.0
-            )
+            # Hold a spawn slot only until the first chunk arrives, so
+            # long-running streams don't block other requests from starting
+            async with _YTDLP_SEM:
+                # Start yt-dlp subprocess
+                process = await asyncio.create_subprocess_exec(
+                    *cmd,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE,
+                    limit=_PIPE_CHUNK_SIZE,
+                )
+                
+                # Check if process started and has stdout
+                if process.stdout is None:
+                    raise RuntimeError("Failed to open yt-dlp stdout pipe")
+                
+                # Read a small chunk first to verify we're getting audio data
+                first_chunk = await asyncio.wait_for(
+                    process.stdout.read(8192),
+                    timeout=30.0
+                )
             
             if not first_chunk:
                 # Process exited immediately — read stderr for error
                 stderr_data = await process.stderr.read() if process.stderr else b""
                 err_msg = stderr_data.decode(errors="ignore").strip()
-                print(f"❌ [PIPE] Strategy '{strategy['name']}' failed: {err_msg[:200]}")
-                sys.stdout.flush()
+                logger.warning("❌ [PIPE] Strategy '%s' failed: %s", strategy["name"], err_msg[:200])
                 last_error = err_msg[:200]
                 # Clean up process
                 try:
@@ -347,22 +495,20 @@ async def _ytdlp_pipe_stream(video_id: str):
                 await process.wait()
                 continue  # Try next strategy
             
-            print(f"✅ [PIPE] Strategy '{strategy['name']}' SUCCESS! First chunk: {len(first_chunk)} bytes")
-            sys.stdout.flush()
+            logger.debug("✅ [PIPE] Strategy '%s' SUCCESS! First chunk: %d bytes", strategy["name"], len(first_chunk))
             
             # Determine content type from first bytes
-            content_type = "audio/mp4"  # default
-            if first_chunk[:4] == b"OggS":
-                content_type = "audio/ogg"
-            elif first_chunk[:4] == b"\x1aE\xdf\xa3":
-                content_type = "audio/webm"
+            content_type = next(
+                (mime for magic, mime in _MAGIC.items() if first_chunk.startswith(magic)),
+                "audio/mp4",  # default (fMP4/m4a has no fixed leading magic)
+            )
             
             async def stream_generator():
                 """Yield audio chunks from yt-dlp subprocess."""
                 try:
                     yield first_chunk
                     while True:
-                        chunk = await process.stdout.read(65536)  # 64KB chunks
+                        chunk = await process.stdout.read(_PIPE_CHUNK_SIZE)
                         if not chunk:
                             break
                         yield chunk
@@ -385,49 +531,52 @@ async def _ytdlp_pipe_stream(video_id: str):
             )
             
         except asyncio.TimeoutError:
-            print(f"⏱️ [PIPE] Strategy '{strategy['name']}' timed out")
-            sys.stdout.flush()
+            logger.warning("⏱️ [PIPE] Strategy '%s' timed out", strategy["name"])
             last_error = "timed out"
             continue  # Try next strategy
         except HTTPException:
             raise
         except Exception as e:
-            print(f"⚠️ [PIPE] Strategy '{strategy['name']}' error: {e}")
-            sys.stdout.flush()
+            logger.warning("⚠️ [PIPE] Strategy '%s' error: %s", strategy["name"], e)
             last_error = str(e)
             continue  # Try next strategy
     
     # All strategies exhausted
-    print(f"❌ [PIPE] ALL strategies failed for {video_id}: {last_error}")
-    sys.stdout.flush()
+    logger.error("❌ [PIPE] ALL strategies failed for %s: %s", video_id, last_error)
     raise HTTPException(
         status_code=502,
         detail=f"All streaming strategies failed for {video_id}. YouTube may block this server's IP from serving audio. Last error: {last_error}"
     )
 
 
-async def _proxy_stream(stream_url: str, request_range: Optional[str] = None, known_content_type: str = "audio/mp4"):
+async def _proxy_stream(
+    stream_url: str,
+    request_range: Optional[str] = None,
+    known_content_type: str = "audio/mp4",
+    method: str = "GET",
+):
     """
     Proxy audio stream with full byte-range support including header propagation.
     
     known_content_type: The MIME type determined during format selection.
                        This is more reliable than trusting the CDN response.
+    method: "HEAD" probes upstream and returns the headers without a body.
     """
-    req_headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+    # Shared dict is never mutated; copy only when a Range has to be added
+    req_headers = _BASE_STREAM_HEADERS if not request_range else {
+        **_BASE_STREAM_HEADERS,
+        "Range": request_range,
+        "Accept-Encoding": "identity",
     }
-    if request_range:
-        req_headers["Range"] = request_range
 
     # Use a longer timeout for the initial connection
     # Use proxy if configured
     proxy = settings.proxy_url if settings.proxy_url else None
     
     # 🕵️‍♂️ Phase 22: Verbose Debug Logging for Proxy Issues
-    print(f"DEBUG: [STREAM] Starting request for: {stream_url[:60]}...")
-    print(f"DEBUG: [STREAM] Proxy used: {proxy}")
-    print(f"DEBUG: [STREAM] Range Header: {request_range}")
-    sys.stdout.flush()
+    logger.debug("[STREAM] Starting request for: %s...", stream_url[:60])
+    logger.debug("[STREAM] Proxy used: %s", proxy)
+    logger.debug("[STREAM] Range Header: %s", request_range)
 
     client = httpx.AsyncClient(
         proxy=proxy,
@@ -437,7 +586,7 @@ async def _proxy_stream(stream_url: str, request_range: Optional[str] = None, kn
     try:
         # Start the streaming request to YouTube
         response = await client.send(
-            client.build_request("GET", stream_url, headers=req_headers),
+            client.build_request(method, stream_url, headers=req_headers),
             stream=True
         )
         
@@ -448,8 +597,7 @@ async def _proxy_stream(stream_url: str, request_range: Optional[str] = None, kn
         if status_code >= 400:
             error_body = await response.aread()
             error_msg = error_body.decode(errors="ignore")[:500]
-            print(f"❌ [PROXY] Upstream error {status_code} for {stream_url[:50]}")
-            print(f"        Response: {error_msg}")
+            logger.error("❌ [PROXY] Upstream error %d for %s\n        Response: %s", status_code, stream_url[:50], error_msg)
             
             # Close resources since we aren't streaming
             await response.aclose()
@@ -462,16 +610,6 @@ async def _proxy_stream(stream_url: str, request_range: Optional[str] = None, kn
             raise HTTPException(status_code=status_code, detail=detail)
 
         # Extract exact headers from YouTube to forward to the browser
-        
-        # We MUST forward these headers exactly for range-based media to work
-        PASSTHROUGH_HEADERS = [
-            "Content-Length",
-            "Content-Range",
-            "Accept-Ranges",
-            "Last-Modified",
-            "ETag",
-        ]
-
         resp_headers = {
             "Cache-Control": "no-cache",
             "X-Content-Type-Options": "nosniff",
@@ -480,7 +618,7 @@ async def _proxy_stream(stream_url: str, request_range: Optional[str] = None, kn
         }
         
         # Forward requested headers if they exist in the YouTube response
-        for header in PASSTHROUGH_HEADERS:
+        for header in _PASSTHROUGH_HEADERS:
             if header in response.headers:
                 resp_headers[header] = response.headers[header]
 
@@ -489,10 +627,14 @@ async def _proxy_stream(stream_url: str, request_range: Optional[str] = None, kn
         content_type = response.headers.get("Content-Type", known_content_type)
         
         # Log final headers for diagnosis
-        print(f"DEBUG: [STREAM] Upstream status {status_code}")
-        print(f"DEBUG: [STREAM] Content-Type: {content_type}")
-        print(f"DEBUG: [STREAM] Response Headers: {dict(resp_headers)}")
-        sys.stdout.flush()
+        logger.debug("[STREAM] Upstream status %d", status_code)
+        logger.debug("[STREAM] Content-Type: %s", content_type)
+        logger.debug("[STREAM] Response Headers: %s", resp_headers)
+
+        if method == "HEAD":
+            await response.aclose()
+            await client.aclose()
+            return Response(status_code=status_code, media_type=content_type, headers=resp_headers)
 
         async def stream_audio():
             try:
@@ -502,7 +644,7 @@ async def _proxy_stream(stream_url: str, request_range: Optional[str] = None, kn
             except (httpx.ReadError, httpx.RemoteProtocolError):
                 pass
             except Exception as e:
-                print(f"Stream chunk error: {e}")
+                logger.warning("Stream chunk error: %s", e)
             finally:
                 await response.aclose()
                 await client.aclose()
@@ -539,6 +681,25 @@ async def prefetch_youtube_url(video_id: str, priority: int = 3):
     }
 
 
+async def _fetch_youtube_info(video_id: str) -> Dict[str, Any]:
+    """Extract video metadata and store it in the info cache."""
+    ydl_opts = _with_cookies(_YDL_QUIET)
+    url = f"https://www.youtube.com/watch?v={video_id}"
+    info = await _extract(ydl_opts, url)
+    payload = {
+        "id": video_id,
+        "title": info.get("title"),
+        "artist": info.get("uploader") or info.get("channel"),
+        "thumbnail": info.get("thumbnail"),
+        "duration": info.get("duration"),
+        "categories": info.get("categories") or [],
+    }
+    _put_bounded(
+        _info_cache, video_id, CachedInfo(info=payload, cached_at=datetime.now()), _INFO_CACHE_SIZE
+    )
+    return payload
+
+
 @router.get("/youtube/{video_id}/info")
 async def get_youtube_info(video_id: str):
     """Get YouTube video info including thumbnail."""
@@ -551,164 +712,137 @@ async def get_youtube_info(video_id: str):
             "duration": cached.duration,
             "cached": True
         }
+
+    cached_info = _get_valid(_info_cache, video_id)
+    if cached_info:
+        return cached_info.info
     
-    ydl_opts = {"quiet": True, "no_warnings": True}
-    ydl_opts.update(get_yt_dlp_cookie_opts())
-    
-    url = f"https://www.youtube.com/watch?v={video_id}"
     try:
-        # Use stream_manager's persistent instance for info too if possible
-        # For now, keep it simple but run in threadpool
-        info = await anyio.to_thread.run_sync(
-            run_yt_dlp_with_fallback, ydl_opts, url, False
-        )
-        return {
-            "id": video_id,
-            "title": info.get("title"),
-            "artist": info.get("uploader") or info.get("channel"),
-            "thumbnail": info.get("thumbnail"),
-            "duration": info.get("duration"),
-        }
+        return await _single_flight(f"info:{video_id}", lambda: _fetch_youtube_info(video_id))
     except Exception as e:
-        import traceback
-        print(f"❌ [INFO] Failed to fetch info for {video_id}: {str(e)}")
-        print(traceback.format_exc())
-        sys.stdout.flush()
+        logger.exception("❌ [INFO] Failed to fetch info for %s: %s", video_id, e)
         raise HTTPException(status_code=502, detail=f"Upstream info fetch failed: {str(e)}")
 
 
-@router.get("/youtube/{video_id}/related")
-async def get_related_videos(video_id: str, limit: int = 25):
-    """
-    Get related/recommended videos for auto-queue.
-    Uses YouTube Mix playlist (like YouTube's "Up Next") for diverse recommendations.
-    🚀 OPTIMIZED: Uses 6-hour in-memory cache to avoid repeated YouTube calls.
-    """
-    try:
-        # 🚀 CHECK CACHE FIRST (instant return!)
-        if video_id in _recommendation_cache:
-            cached = _recommendation_cache[video_id]
-            if cached.is_valid():
-                print(f"[Cache HIT] Returning {len(cached.tracks)} cached tracks for {video_id}")
-                return cached.tracks[:limit]
-            else:
-                # Cache expired, remove it
-                del _recommendation_cache[video_id]
+async def _fetch_related(video_id: str, limit: int) -> List[Dict[str, Any]]:
+    """Build the related-track list for video_id and store it in the recommendation cache."""
+    # Use FAST_EXTRACT_OPTS as the base for consistency (extractor_args, etc.)
+    ydl_opts = _with_cookies(_YDL_MIX)
 
-        print(f"[Cache MISS] Fetching related tracks for {video_id}...")
-        sys.stdout.flush()
+    related = []
 
-        # Use FAST_EXTRACT_OPTS as the base for consistency (extractor_args, etc.)
-        ydl_opts = FAST_EXTRACT_OPTS.copy()
-        ydl_opts.update({
-            "extract_flat": "in_playlist",
-        })
-        ydl_opts.update(get_yt_dlp_cookie_opts())
-
-        related = []
+    # Method 1: Try to get YouTube's Mix playlist (RD = Radio/Mix)
+    mix_url = f"https://www.youtube.com/watch?v={video_id}&list=RD{video_id}"
+    try:
+        mix_info = await _extract(ydl_opts, mix_url)
+
+        if mix_info and "entries" in mix_info:
+            for entry in mix_info["entries"]:
+                if entry and entry.get("id") and entry.get("id") != video_id:
+                    if not any(r["id"] == entry["id"] for r in related):
+                        related.append({
+                            "id": entry.get("id"),
+                            "title": entry.get("title", "Unknown"),
+                            "artist": entry.get("uploader") or entry.get("channel") or "YouTube",
+                            "thumbnail_url": entry.get("thumbnail") or f"https://i.ytimg.com/vi/{entry.get('id')}/hqdefault.jpg",
+                            "duration": entry.get("duration"),
+                            "source": "youtube"
+                        })
+                    if len(related) >= limit:
+                        break
+    except Exception as e:
+        logger.warning("Mix playlist failed: %s", e)
 
-        # Method 1: Try to get YouTube's Mix playlist (RD = Radio/Mix)
-        mix_url = f"https://www.youtube.com/watch?v={video_id}&list=RD{video_id}"
+    # Method 2: Genre-based searches for diversity
+    if len(related) < limit:
         try:
-            mix_info = await anyio.to_thread.run_sync(
-                run_yt_dlp_with_fallback, ydl_opts, mix_url, False
-            )
+            # Categories come from the /info payload: reuse a cached one, or
+            # share (and cache) the same extraction a concurrent /info runs
+            cached_info = _get_valid(_info_cache, video_id)
+            if cached_info:
+                info = cached_info.info
+            else:
+                info = await _single_flight(
+                    f"info:{video_id}", lambda: _fetch_youtube_info(video_id)
+                )
+            categories = info.get("categories") or []
+            search_queries = []
 
-            if mix_info and "entries" in mix_info:
-                for entry in mix_info["entries"]:
-                    if entry and entry.get("id") and entry.get("id") != video_id:
-                        if not any(r["id"] == entry["id"] for r in related):
-                            related.append({
-                                "id": entry.get("id"),
-                                "title": entry.get("title", "Unknown"),
-                                "artist": entry.get("uploader") or entry.get("channel") or "YouTube",
-                                "thumbnail_url": entry.get("thumbnail") or f"https://i.ytimg.com/vi/{entry.get('id')}/hqdefault.jpg",
-                                "duration": entry.get("duration"),
-                                "source": "youtube"
-                            })
-                        if len(related) >= limit:
-                            break
-        except Exception as e:
-            print(f"Mix playlist failed: {e}")
+            for cat in categories[:2]:
+                if "music" in cat.lower():
+                    search_queries.append(f"{cat} 2024 hits")
 
-        # Method 2: Genre-based searches for diversity
-        if len(related) < limit:
-            try:
-                info_opts = FAST_EXTRACT_OPTS.copy()
-                info_opts.update(get_yt_dlp_cookie_opts())
+            if not search_queries:
+                search_queries = [
+                    "dancehall music 2024",
+                    "afrobeats top hits",
+                    "reggae vibes 2024",
+                    "soca music latest"
+                ]
 
-                url = f"https://www.youtube.com/watch?v={video_id}"
-                info = await anyio.to_thread.run_sync(
-                    run_yt_dlp_with_fallback, info_opts, url, False
-                )
+            search_opts = _with_cookies(_YDL_FLAT)
 
-                categories = info.get("categories", []) if info else []
-                search_queries = []
-
-                for cat in categories[:2]:
-                    if "music" in cat.lower():
-                        search_queries.append(f"{cat} 2024 hits")
-
-                if not search_queries:
-                    search_queries = [
-                        "dancehall music 2024",
-                        "afrobeats top hits",
-                        "reggae vibes 2024",
-                        "soca music latest"
-                    ]
-
-                search_opts = {
-                    "quiet": True,
-                    "no_warnings": True,
-                    "extract_flat": "in_playlist",
-                }
-                search_opts.update(get_yt_dlp_cookie_opts())
+            for query in search_queries[:2]:
+                if len(related) >= limit:
+                    break
 
-                for query in search_queries[:2]:
-                    if len(related) >= limit:
-                        break
+                try:
+                    needed = limit - len(related)
+                    search_results = await _extract(search_opts, f"ytsearch{needed}:{query}")
+                    if search_results and "entries" in search_results:
+                        for entry in search_results["entries"]:
+                            if entry and entry.get("id") and entry.get("id") != video_id:
+                                if not any(r["id"] == entry["id"] for r in related):
+                                    related.append({
+                                        "id": entry.get("id"),
+                                        "title": entry.get("title", "Unknown"),
+                                        "artist": entry.get("uploader") or entry.get("channel") or "YouTube",
+                                        "thumbnail_url": entry.get("thumbnail") or f"https://i.ytimg.com/vi/{entry.get('id')}/hqdefault.jpg",
+                                        "duration": entry.get("duration"),
+                                        "source": "youtube"
+                                    })
+                                if len(related) >= limit:
+                                    break
+                except Exception:
+                    pass
+        except Exception:
+            pass
+
+    # 🚀 CACHE RESULTS for future requests (6 hour TTL)
+    if related:
+        _put_bounded(
+            _recommendation_cache,
+            video_id,
+            CachedRecommendation(tracks=related, cached_at=datetime.now()),
+            _RECOMMENDATION_CACHE_SIZE,
+        )
+        logger.debug("[Cache SAVE] Stored %d tracks for %s", len(related), video_id)
 
-                    try:
-                        needed = limit - len(related)
-                        search_results = run_yt_dlp_with_fallback(
-                            search_opts,
-                            f"ytsearch{needed}:{query}",
-                            download=False
-                        )
-                        if search_results and "entries" in search_results:
-                            for entry in search_results["entries"]:
-                                if entry and entry.get("id") and entry.get("id") != video_id:
-                                    if not any(r["id"] == entry["id"] for r in related):
-                                        related.append({
-                                            "id": entry.get("id"),
-                                            "title": entry.get("title", "Unknown"),
-                                            "artist": entry.get("uploader") or entry.get("channel") or "YouTube",
-                                            "thumbnail_url": entry.get("thumbnail") or f"https://i.ytimg.com/vi/{entry.get('id')}/hqdefault.jpg",
-                                            "duration": entry.get("duration"),
-                                            "source": "youtube"
-                                        })
-                                    if len(related) >= limit:
-                                        break
-                    except Exception:
-                        pass
-            except Exception:
-                pass
+    return related
 
-        # 🚀 CACHE RESULTS for future requests (6 hour TTL)
-        if related:
-            _recommendation_cache[video_id] = CachedRecommendation(
-                tracks=related,
-                cached_at=datetime.now()
-            )
-            print(f"[Cache SAVE] Stored {len(related)} tracks for {video_id}")
-            sys.stdout.flush()
 
+@router.get("/youtube/{video_id}/related")
+async def get_related_videos(video_id: str, limit: int = 25):
+    """
+    Get related/recommended videos for auto-queue.
+    Uses YouTube Mix playlist (like YouTube's "Up Next") for diverse recommendations.
+    🚀 OPTIMIZED: Uses 6-hour in-memory cache to avoid repeated YouTube calls.
+    """
+    try:
+        # 🚀 CHECK CACHE FIRST (instant return!)
+        cached = _get_valid(_recommendation_cache, video_id)
+        if cached:
+            logger.debug("[Cache HIT] Returning %d cached tracks for %s", len(cached.tracks), video_id)
+            return cached.tracks[:limit]
+
+        logger.debug("[Cache MISS] Fetching related tracks for %s...", video_id)
+
+        related = await _single_flight(
+            f"related:{video_id}:{limit}", lambda: _fetch_related(video_id, limit)
+        )
         return related[:limit]
     except Exception as e:
-        import traceback
-        print(f"❌ [RELATED] Critical error for {video_id}: {str(e)}")
-        print(traceback.format_exc())
-        sys.stdout.flush()
+        logger.exception("❌ [RELATED] Critical error for %s: %s", video_id, e)
         from fastapi.responses import JSONResponse
         return JSONResponse(
             status_code=502,
@@ -722,20 +856,33 @@ async def cache_stats():
     return stream_manager.get_stats()
 
 
+# Trending is about freshness, so keep the pooled results only briefly
+_TRENDING_TTL = timedelta(minutes=10)
+_trending_cache: Optional[tuple] = None  # (cached_at, tracks)
+
+
 @router.get("/trending")
-async def get_trending_music(limit: int = 10):
+async def get_trending_music(limit: int = Query(10, ge=1, le=50)):
     """
     Fetch trending music videos from YouTube.
     Uses multiple sources for diverse trending content.
     """
-    ydl_opts = {
-        "quiet": True,
-        "no_warnings": True,
-        "extract_flat": "in_playlist",
-    }
-    ydl_opts.update(get_yt_dlp_cookie_opts())
+    if _trending_cache:
+        cached_at, cached = _trending_cache
+        if datetime.now() - cached_at < _TRENDING_TTL and len(cached) >= limit:
+            return random.sample(cached, limit)
+
+    trending = await _single_flight(f"trending:{limit}", lambda: _fetch_trending(limit))
     
-    trending = []
+    # Shuffle to mix content from different queries
+    return random.sample(trending, min(limit, len(trending)))
+
+
+async def _fetch_trending(limit: int) -> List[Dict[str, Any]]:
+    """Run the trending searches and refresh the trending pool cache."""
+    global _trending_cache
+
+    search_opts = _with_cookies(_YDL_SEARCH)
     
     # Search queries for trending music (mix of genres and charts)
     search_queries = [
@@ -747,59 +894,44 @@ async def get_trending_music(limit: int = 10):
         "afrobeats 2024",
     ]
     
-    import random
     # Pick 2-3 random queries for variety
     selected_queries = random.sample(search_queries, min(3, len(search_queries)))
     
-    for query in selected_queries:
-        if len(trending) >= limit:
-            break
-            
-        try:
-            needed = limit - len(trending)
-            search_opts = {
-                "quiet": True,
-                "no_warnings": True,
-                "extract_flat": True,
-            }
-            search_opts.update(get_yt_dlp_cookie_opts())
-            
-            search_results = await anyio.to_thread.run_sync(
-                run_yt_dlp_with_fallback,
-                search_opts,
-                f"ytsearch{needed + 5}:{query}",  # Get a few extra for filtering
-                False
-            )
-            
-            if search_results and "entries" in search_results:
-                for entry in search_results["entries"]:
-                    if not entry or not entry.get("id"):
-                        continue
-                    # Skip if already have this video
-                    if any(t["id"] == entry["id"] for t in trending):
-                        continue
-                    # Skip if no title
-                    if not entry.get("title"):
-                        continue
-                        
-                    trending.append({
-                        "id": entry.get("id"),
-                        "title": entry.get("title", "Unknown"),
-                        "artist": entry.get("uploader") or entry.get("channel") or "YouTube",
-                        "thumbnail_url": entry.get("thumbnail") or f"https://i.ytimg.com/vi/{entry.get('id')}/hqdefault.jpg",
-                        "duration": entry.get("duration") or 0,
-                        "source": "youtube",
-                        "youtube_id": entry.get("id")
-                    })
-                    
-                    if len(trending) >= limit:
-                        break
-        except Exception as e:
-            print(f"Trending search failed for '{query}': {e}")
-            continue
+    # Run the searches concurrently; one failing query shouldn't sink the rest
+    results = await asyncio.gather(
+        *(
+            _extract(search_opts, f"ytsearch{limit + 5}:{query}")  # Get a few extra for filtering
+            for query in selected_queries
+        ),
+        return_exceptions=True,
+    )
     
-    # Shuffle to mix content from different queries
-    random.shuffle(trending)
+    trending = []
+    seen = set()
+    for query, search_results in zip(selected_queries, results):
+        if isinstance(search_results, Exception):
+            logger.warning("Trending search failed for '%s': %s", query, search_results)
+            continue
+        if not search_results or "entries" not in search_results:
+            continue
+        for entry in search_results["entries"]:
+            if not entry or not entry.get("id"):
+                continue
+            # Skip if already have this video, or if no title
+            if entry["id"] in seen or not entry.get("title"):
+                continue
+            seen.add(entry["id"])
+                
+            trending.append({
+                "id": entry.get("id"),
+                "title": entry.get("title", "Unknown"),
+                "artist": entry.get("uploader") or entry.get("channel") or "YouTube",
+                "thumbnail_url": entry.get("thumbnail") or f"https://i.ytimg.com/vi/{entry.get('id')}/hqdefault.jpg",
+                "duration": entry.get("duration") or 0,
+                "source": "youtube",
+                "youtube_id": entry.get("id")
+            })
     
-    return trending[:limit]
-
+    if trending:
+        _trending_cache = (datetime.now(), trending)
+    return trending
@@ -2,23 +2,57 @@ from __future__ import annotations
 
 from datetime import datetime
 from pathlib import Path
-from typing import List, Literal, Optional
+from collections.abc import Mapping
+from typing import Annotated, Any, List, Literal, Optional, Union
 
-from pydantic import BaseModel, HttpUrl, PositiveInt, field_validator
+from pydantic import AfterValidator, BaseModel, ConfigDict, Field, HttpUrl, PositiveInt, TypeAdapter, field_validator
+from typing_extensions import NotRequired, TypedDict
 
 
-class VideoFormat(BaseModel):
+class ResponseModel(BaseModel):
+    """Base for outbound schemas.
+
+    Validators are built on first use rather than at import, and instances are
+    immutable once constructed.
+    """
+    model_config = ConfigDict(defer_build=True, frozen=True, extra="ignore")
+
+
+class TrustedModel(ResponseModel):
+    """Response model that can be built from already-typed data without validation.
+
+    Use ``from_orm_trusted`` for ORM rows and stored payloads the app wrote
+    itself; keep normal construction / ``model_validate`` for client input.
+    """
+
+    @classmethod
+    def from_orm_trusted(cls, obj: Any, **overrides: Any):
+        # Overridden fields are never read from obj, so passing e.g. tracks=None
+        # keeps a lazy ORM relationship from being touched
+        data = dict(overrides)
+        if isinstance(obj, Mapping):
+            for f in cls.model_fields:
+                if f not in data and f in obj:
+                    data[f] = obj[f]
+        else:
+            for f in cls.model_fields:
+                if f not in data and hasattr(obj, f):
+                    data[f] = getattr(obj, f)
+        return cls.model_construct(**data)
+
+
+class VideoFormat(ResponseModel):
     height: Optional[int] = None
     ext: Optional[str] = None
     note: Optional[str] = None
 
 
-class AudioFormat(BaseModel):
+class AudioFormat(ResponseModel):
     abr: Optional[int] = None
     ext: Optional[str] = None
 
 
-class VideoInfo(BaseModel):
+class VideoInfo(ResponseModel):
     id: str
     title: str
     uploader: Optional[str] = None
@@ -35,16 +69,27 @@ class VideoInfoRequest(BaseModel):
     force_single: bool = False
 
 
-class SuggestionRequest(BaseModel):
-    query: str
+def _strip_min2(value: str) -> str:
+    value = value.strip()
+    if len(value) < 2:
+        raise ValueError("Query must be at least 2 characters.")
+    return value
+
+
+def _strip_nonempty(value: str) -> str:
+    value = value.strip()
+    if not value:
+        raise ValueError("Query is required.")
+    return value
 
-    @field_validator("query")
-    @classmethod
-    def validate_query(cls, value: str) -> str:
-        value = value.strip()
-        if len(value) < 2:
-            raise ValueError("Query must be at least 2 characters.")
-        return value
+
+# Shared query types so every request model reuses the same validator
+MinTwoCharQuery = Annotated[str, AfterValidator(_strip_min2)]
+NonEmptyQuery = Annotated[str, AfterValidator(_strip_nonempty)]
+
+
+class SuggestionRequest(BaseModel):
+    query: MinTwoCharQuery
 
 
 class DownloadRequest(BaseModel):
@@ -59,12 +104,22 @@ class DownloadRequest(BaseModel):
     thumbnail: Optional[str] = None
 
 
+# Shared validator for URL lists; results are kept as plain strings so
+# downstream code never re-parses them
+_URL_LIST_ADAPTER = TypeAdapter(List[HttpUrl])
+
+
 class BatchDownloadRequest(BaseModel):
-    urls: List[HttpUrl]
-    format: Literal["audio", "video"] = "video"
+    urls: List[str]
+    format: Literal["audio", "video"] = "audio"
     quality: str = "best"
     folder_name: Optional[str] = None
 
+    @field_validator("urls", mode="before")
+    @classmethod
+    def validate_urls(cls, value):
+        return [str(url) for url in _URL_LIST_ADAPTER.validate_python(value)]
+
 
 class QueueItem(BaseModel):
     id: str
@@ -76,12 +131,12 @@ class QueueItem(BaseModel):
     thumbnail: Optional[str] = None
 
 
-class DownloadResponse(BaseModel):
+class DownloadResponse(ResponseModel):
     task_id: str
     status: str
 
 
-class ProgressPayload(BaseModel):
+class ProgressPayload(ResponseModel):
     status: Literal["starting", "downloading", "processing", "completed", "error"]
     percent: float = 0.0
     filename: Optional[str] = None
@@ -100,7 +155,7 @@ class PlaylistRequest(BaseModel):
     limit: PositiveInt = 100
 
 
-class PlaylistVideo(BaseModel):
+class PlaylistVideo(ResponseModel):
     id: str
     title: str
     url: HttpUrl
@@ -109,7 +164,7 @@ class PlaylistVideo(BaseModel):
     uploader: Optional[str] = None
 
 
-class YoutubePlaylistResponse(BaseModel):
+class YoutubePlaylistResponse(ResponseModel):
     title: str
     count: int
     videos: List[PlaylistVideo]
@@ -127,7 +182,7 @@ class PlaylistUpdate(BaseModel):
     cover_image: Optional[str] = None
 
 
-class PlaylistTrackResponse(BaseModel):
+class PlaylistTrackResponse(TrustedModel):
     id: int
     title: str
     artist: str
@@ -137,7 +192,7 @@ class PlaylistTrackResponse(BaseModel):
     added_at: datetime
 
 
-class PlaylistResponse(BaseModel):
+class PlaylistResponse(TrustedModel):
     id: int
     name: str
     description: Optional[str] = None
@@ -150,18 +205,10 @@ class PlaylistResponse(BaseModel):
 
 
 class SearchRequest(BaseModel):
-    query: str
-
-    @field_validator("query")
-    @classmethod
-    def validate_query(cls, value: str) -> str:
-        value = value.strip()
-        if not value:
-            raise ValueError("Query is required.")
-        return value
+    query: NonEmptyQuery
 
 
-class SearchResult(BaseModel):
+class SearchResult(TrustedModel):
     id: str
     title: str
     uploader: Optional[str] = None
@@ -170,7 +217,7 @@ class SearchResult(BaseModel):
     thumbnail: Optional[HttpUrl] = None
 
 
-class LibraryFile(BaseModel):
+class LibraryFile(TrustedModel):
     name: str
     path: Path
     size_mb: float
@@ -199,7 +246,7 @@ class AnalyticsRequest(BaseModel):
 # QUEUE SCHEMAS
 # =============================================================================
 
-class QueueTrack(BaseModel):
+class QueueTrack(TrustedModel):
     """Track representation for queue persistence"""
     id: str | int
     title: str
@@ -212,16 +259,36 @@ class QueueTrack(BaseModel):
     youtube_id: Optional[str] = None
 
 
+class QueueTrackTD(TypedDict):
+    """Plain-dict QueueTrack for bulk queue payloads.
+
+    Validating a list of TypedDicts skips per-item model construction, and the
+    result can be stored as JSON without a model_dump() round trip.
+    """
+    id: str | int
+    title: str
+    artist: str
+    album: NotRequired[Optional[str]]
+    thumbnail: NotRequired[Optional[str]]
+    duration: NotRequired[Optional[int]]
+    source: Literal["youtube", "local", "cached"]
+    uri: str
+    youtube_id: NotRequired[Optional[str]]
+
+
+QUEUE_TRACKS_ADAPTER = TypeAdapter(List[QueueTrackTD])
+
+
 class QueueStateRequest(BaseModel):
     """Request body for updating queue state"""
-    tracks: List[QueueTrack]
+    tracks: List[QueueTrackTD]
     current_index: int = -1
     current_time_sec: float = 0.0
     repeat_mode: Literal["none", "one", "all"] = "none"
     is_shuffle: bool = False
 
 
-class QueueStateResponse(BaseModel):
+class QueueStateResponse(ResponseModel):
     """Response body for queue state"""
     tracks: List[QueueTrack]
     current_index: int
@@ -244,7 +311,7 @@ class PartyTrack(QueueTrack):
     pass
 
 
-class PartySessionState(BaseModel):
+class PartySessionState(ResponseModel):
     """Full state of a party session"""
     session_id: str
     host_id: str
@@ -260,11 +327,46 @@ class PartyJoinRequest(BaseModel):
     session_id: str
 
 
-class PartyActionRequest(BaseModel):
-    """Generic request for party actions (add, remove, skip, vote)"""
-    action: Literal["add", "remove", "skip", "vote_skip", "play_next", "clear", "reorder"]
-    track: Optional[QueueTrack] = None
-    target_id: Optional[str | int] = None
-    from_index: Optional[int] = None
-    to_index: Optional[int] = None
+class _PartyAction(BaseModel):
     user_id: Optional[str] = None
+
+
+class AddAction(_PartyAction):
+    action: Literal["add"]
+    track: QueueTrack
+
+
+class RemoveAction(_PartyAction):
+    action: Literal["remove"]
+    target_id: str | int
+
+
+class SkipAction(_PartyAction):
+    action: Literal["skip"]
+
+
+class VoteSkipAction(_PartyAction):
+    action: Literal["vote_skip"]
+
+
+class PlayNextAction(_PartyAction):
+    action: Literal["play_next"]
+    track: QueueTrack
+
+
+class ClearAction(_PartyAction):
+    action: Literal["clear"]
+
+
+class ReorderAction(_PartyAction):
+    action: Literal["reorder"]
+    from_index: int
+    to_index: int
+
+
+# Request for party actions (add, remove, skip, vote); validation dispatches on
+# "action" straight to the one model that applies
+PartyActionRequest = Annotated[
+    Union[AddAction, RemoveAction, SkipAction, VoteSkipAction, PlayNextAction, ClearAction, ReorderAction],
+    Field(discriminator="action"),
+]
@@ -2,16 +2,48 @@
 Onyx Streaming - Auth Service
 JWT authentication and password hashing
 """
-import jwt
-import bcrypt
-from datetime import datetime, timedelta
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import time
+from bcrypt import checkpw as _bcrypt_checkpw, gensalt as _bcrypt_gensalt, hashpw as _bcrypt_hashpw
+from jwt import decode as _jwt_decode, ExpiredSignatureError, InvalidTokenError
+from functools import lru_cache
 from typing import Optional
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import insert, select, update
 
 from app.models.user import User, Profile
 from app.config import get_settings
 
+# bcrypt work factor (the library default); each hash costs ~100ms of CPU
+_BCRYPT_ROUNDS = 12
+
+
+def _b64url(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+# The HS256 header never changes, so it is serialized once
+_JWT_HEADER_B64 = _b64url(json.dumps({"alg": "HS256", "typ": "JWT"}, separators=(",", ":")).encode())
+
+
+@lru_cache(maxsize=4)
+def _hs256_context(secret: bytes) -> "hmac.HMAC":
+    """Keyed HMAC-SHA256 base context; copied per token instead of re-keying."""
+    return hmac.new(secret, digestmod=hashlib.sha256)
+
+
+def _encode_hs256(payload: dict, secret: bytes) -> str:
+    """Mint an HS256 JWT; output is interchangeable with jwt.encode(..., "HS256")."""
+    body = _b64url(json.dumps(payload, separators=(",", ":")).encode())
+    signing_input = _JWT_HEADER_B64 + b"." + body
+    ctx = _hs256_context(secret).copy()
+    ctx.update(signing_input)
+    return (signing_input + b"." + _b64url(ctx.digest())).decode()
+
 
 class AuthService:
     """Authentication service for user management"""
@@ -19,51 +51,56 @@ class AuthService:
     def __init__(self, db: AsyncSession):
         self.db = db
         self.settings = get_settings()
+        # Resolved once per service instead of on every token operation
+        self._jwt_secret: bytes = self.settings.jwt_secret.encode()
+        self._access_ttl = self.settings.jwt_access_token_expire_hours * 3600
+        self._refresh_ttl = self.settings.jwt_refresh_token_expire_days * 86400
     
-    # Password hashing
+    # Password hashing (bcrypt is CPU-bound, so it runs off the event loop)
     @staticmethod
-    def hash_password(password: str) -> str:
+    async def hash_password(password: str) -> str:
         """Hash password with bcrypt"""
-        salt = bcrypt.gensalt()
-        return bcrypt.hashpw(password.encode(), salt).decode()
+        salt = _bcrypt_gensalt(rounds=_BCRYPT_ROUNDS)
+        hashed = await asyncio.to_thread(_bcrypt_hashpw, password.encode(), salt)
+        return hashed.decode()
     
     @staticmethod
-    def verify_password(password: str, hashed: str) -> bool:
+    async def verify_password(password: str, hashed: str) -> bool:
         """Verify password against hash"""
-        return bcrypt.checkpw(password.encode(), hashed.encode())
+        return await asyncio.to_thread(_bcrypt_checkpw, password.encode(), hashed.encode())
     
     # JWT tokens
     def create_access_token(self, user_id: int, profile_id: Optional[int] = None) -> str:
         """Create JWT access token"""
-        expire = datetime.utcnow() + timedelta(hours=24)
+        now = int(time.time())
         payload = {
             "sub": str(user_id),
             "profile_id": profile_id,
-            "exp": expire,
-            "iat": datetime.utcnow(),
+            "exp": now + self._access_ttl,
+            "iat": now,
             "type": "access"
         }
-        return jwt.encode(payload, self.settings.jwt_secret, algorithm="HS256")
+        return _encode_hs256(payload, self._jwt_secret)
     
     def create_refresh_token(self, user_id: int) -> str:
         """Create JWT refresh token"""
-        expire = datetime.utcnow() + timedelta(days=30)
+        now = int(time.time())
         payload = {
             "sub": str(user_id),
-            "exp": expire,
-            "iat": datetime.utcnow(),
+            "exp": now + self._refresh_ttl,
+            "iat": now,
             "type": "refresh"
         }
-        return jwt.encode(payload, self.settings.jwt_secret, algorithm="HS256")
+        return _encode_hs256(payload, self._jwt_secret)
     
     def decode_token(self, token: str) -> Optional[dict]:
         """Decode and validate JWT token"""
         try:
-            payload = jwt.decode(token, self.settings.jwt_secret, algorithms=["HS256"])
+            payload = _jwt_decode(token, self._jwt_secret, algorithms=["HS256"])
             return payload
-        except jwt.ExpiredSignatureError:
+        except ExpiredSignatureError:
             return None
-        except jwt.InvalidTokenError:
+        except InvalidTokenError:
             return None
     
     # User operations
@@ -88,23 +125,36 @@ class AuthService:
         )
         return result.scalar_one_or_none()
     
+    async def get_users_by_ids(self, user_ids: list[int]) -> dict[int, User]:
+        """Find several users in one query, keyed by ID"""
+        if not user_ids:
+            return {}
+        result = await self.db.execute(
+            select(User).where(User.id.in_(set(user_ids)))
+        )
+        return {user.id: user for user in result.scalars()}
+    
     async def create_user(self, username: str, email: str, password: str, is_admin: bool = False) -> User:
         """Create new user account"""
-        user = User(
-            username=username,
-            email=email,
-            password_hash=self.hash_password(password),
-            is_admin=is_admin
+        # INSERT ... RETURNING populates defaults without a follow-up refresh SELECT
+        result = await self.db.execute(
+            insert(User)
+            .values(
+                username=username,
+                email=email,
+                password_hash=await self.hash_password(password),
+                is_admin=is_admin
+            )
+            .returning(User)
         )
-        self.db.add(user)
+        user = result.scalar_one()
         await self.db.commit()
-        await self.db.refresh(user)
         return user
     
     async def authenticate(self, email: str, password: str) -> Optional[User]:
         """Authenticate user with email and password"""
         user = await self.get_user_by_email(email)
-        if user and self.verify_password(password, user.password_hash):
+        if user and await self.verify_password(password, user.password_hash):
             return user
         return None
     
@@ -123,30 +173,46 @@ class AuthService:
         )
         return result.scalar_one_or_none()
     
+    async def get_profiles_by_ids(self, profile_ids: list[int]) -> dict[int, Profile]:
+        """Get several profiles in one query, keyed by ID"""
+        if not profile_ids:
+            return {}
+        result = await self.db.execute(
+            select(Profile).where(Profile.id.in_(set(profile_ids)))
+        )
+        return {profile.id: profile for profile in result.scalars()}
+    
     async def create_profile(self, user_id: int, name: str, avatar_url: Optional[str] = None) -> Profile:
         """Create new profile for user"""
-        profile = Profile(
-            user_id=user_id,
-            name=name,
-            avatar_url=avatar_url
+        result = await self.db.execute(
+            insert(Profile)
+            .values(
+                user_id=user_id,
+                name=name,
+                avatar_url=avatar_url
+            )
+            .returning(Profile)
         )
-        self.db.add(profile)
+        profile = result.scalar_one()
         await self.db.commit()
-        await self.db.refresh(profile)
         return profile
     
     async def update_profile(self, profile_id: int, **kwargs) -> Optional[Profile]:
         """Update profile fields"""
-        profile = await self.get_profile_by_id(profile_id)
-        if not profile:
-            return None
-        
-        for key, value in kwargs.items():
-            if hasattr(profile, key):
-                setattr(profile, key, value)
+        columns = Profile.__table__.columns
+        values = {key: value for key, value in kwargs.items() if key in columns}
+        if not values:
+            return await self.get_profile_by_id(profile_id)
         
+        # Single UPDATE ... RETURNING instead of SELECT, UPDATE, then refresh
+        result = await self.db.execute(
+            update(Profile)
+            .where(Profile.id == profile_id)
+            .values(**values)
+            .returning(Profile)
+        )
+        profile = result.scalar_one_or_none()
         await self.db.commit()
-        await self.db.refresh(profile)
         return profile
     
     async def delete_profile(self, profile_id: int) -> bool:
@@ -164,7 +230,7 @@ class AuthService:
         profile = await self.get_profile_by_id(profile_id)
         if not profile or not profile.pin_hash:
             return True  # No PIN set
-        return self.verify_password(pin, profile.pin_hash)
+        return await self.verify_password(pin, profile.pin_hash)
     
     async def set_profile_pin(self, profile_id: int, pin: str) -> bool:
         """Set or update profile PIN"""
@@ -172,6 +238,6 @@ class AuthService:
         if not profile:
             return False
         
-        profile.pin_hash = self.hash_password(pin)
+        profile.pin_hash = await self.hash_password(pin)
         await self.db.commit()
         return True
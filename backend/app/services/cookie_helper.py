@@ -3,19 +3,33 @@ Cookie Helper v2 - Pre-extracted Cookie Cache
 Extracts browser cookies ONCE at startup and caches to a file.
 This eliminates the 5-10 second cookie scan on every extraction.
 """
-import yt_dlp
+import asyncio
 import tempfile
 import os
+import logging
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict, Optional
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional
 from datetime import datetime, timedelta
 from ..config import settings
 
+logger = logging.getLogger(__name__)
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, extraction runs unguarded
+    fcntl = None
+
 BROWSERS = ["brave", "chrome", "edge", "firefox", "opera", "vivaldi", "safari"]
 
 # Cookie file path - persists across process restarts
 COOKIE_FILE = Path(tempfile.gettempdir()) / "onyx_youtube_cookies.txt"
-COOKIE_LOCK_FILE = Path(tempfile.gettempdir()) / "onyx_cookie_lock"
+COOKIE_LOCK_FILE = Path(tempfile.gettempdir()) / "onyx_cookie_lock"  # flock target, never removed
+COOKIE_LOCK_TIMEOUT_SEC = 30  # how long a waiter waits on another extraction
 
 # Manual cookie locations (checked first)
 MANUAL_COOKIE_PATHS = [
@@ -30,9 +44,18 @@ _cookie_state = {
     "file_path": None,
     "extracted_at": None,
     "browser": None,
+    "announced": False,  # whether the active cookie file has been logged yet
 }
 COOKIE_FILE_TTL = timedelta(hours=4)  # Re-extract every 4 hours
 
+# Manual cookie files are not looked up on every call: the lookup (or, once
+# found, the chosen file's mtime) is re-checked at most once a minute, so an
+# added or replaced cookies.txt is picked up without a restart
+_MANUAL_COOKIE_RECHECK_SEC = 60.0
+_manual_cookie_resolved = False
+_manual_cookie_path: Optional[str] = None
+_manual_cookie_checked_at = 0.0
+
 # Optimized extraction options for SPEED
 def get_yt_dlp_proxy_opt() -> Dict[str, Any]:
     """Returns proxy option if configured in settings."""
@@ -72,17 +95,54 @@ FAST_EXTRACT_OPTS = {
 }
 
 
+def _resolve_manual_cookie() -> Optional[str]:
+    """Find the first non-empty manual cookie file (cached, re-checked each minute)."""
+    global _manual_cookie_resolved, _manual_cookie_path, _manual_cookie_checked_at
+    now = time.monotonic()
+    if _manual_cookie_resolved and now - _manual_cookie_checked_at < _MANUAL_COOKIE_RECHECK_SEC:
+        return _manual_cookie_path
+    _manual_cookie_checked_at = now
+    _manual_cookie_resolved = True
+
+    if _manual_cookie_path is not None:
+        try:
+            mtime = datetime.fromtimestamp(os.stat(_manual_cookie_path).st_mtime)
+        except OSError:
+            # File went away: rescan the candidate paths below
+            logger.debug("🍪 [COOKIE] MANUAL cookie file disappeared: %s", _manual_cookie_path)
+            _manual_cookie_path = None
+            _cookie_state["file_path"] = None
+            _cookie_state["extracted_at"] = None
+        else:
+            if mtime != _cookie_state["extracted_at"]:
+                # New extracted_at retires the YoutubeDL instances (and cookie
+                # jars) keyed on the old one in _run_ydl
+                logger.debug("🍪 [COOKIE] MANUAL cookie file changed, reloading: %s", _manual_cookie_path)
+                _cookie_state["extracted_at"] = mtime
+            return _manual_cookie_path
+
+    # No manual file yet (or it vanished): look again, so a cookies.txt
+    # dropped in after startup is picked up without a restart
+    for path in MANUAL_COOKIE_PATHS:
+        try:
+            st = path.stat()
+        except OSError:
+            continue
+        if st.st_size > 0:
+            _manual_cookie_path = str(path)
+            _cookie_state["file_path"] = _manual_cookie_path
+            _cookie_state["extracted_at"] = datetime.fromtimestamp(st.st_mtime)
+            _cookie_state["announced"] = True
+            logger.debug("🍪 [COOKIE] Found MANUAL cookie file: %s (%d bytes)", path, st.st_size)
+            break
+    return _manual_cookie_path
+
+
 def is_cookie_file_valid() -> bool:
     """Check if the cached cookie file exists and is fresh."""
-    import sys
-    # Priority 1: Check manual cookie files
-    for path in MANUAL_COOKIE_PATHS:
-        if path.exists() and path.stat().st_size > 0:
-            _cookie_state["file_path"] = str(path)
-            _cookie_state["extracted_at"] = datetime.fromtimestamp(path.stat().st_mtime)
-            print(f"🍪 [COOKIE] Found MANUAL cookie file: {path} ({path.stat().st_size} bytes)")
-            sys.stdout.flush()
-            return True
+    # Priority 1: Manual cookie file (resolved once)
+    if _resolve_manual_cookie():
+        return True
 
     if not COOKIE_FILE.exists():
         return False
@@ -96,42 +156,67 @@ def is_cookie_file_valid() -> bool:
     if datetime.now() - mtime < COOKIE_FILE_TTL:
         _cookie_state["extracted_at"] = mtime
         _cookie_state["file_path"] = str(COOKIE_FILE)
+        if not _cookie_state["announced"]:
+            _cookie_state["announced"] = True
+            logger.debug("🍪 [COOKIE] Using cached cookie file: %s", COOKIE_FILE)
         return True
     
     return False
 
 
+def _flock_until(fd: int, op: int, deadline: float) -> bool:
+    """Poll a non-blocking flock until it is granted or the deadline passes."""
+    while True:
+        try:
+            fcntl.flock(fd, op | fcntl.LOCK_NB)
+            return True
+        except BlockingIOError:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.25)
+
+
 def extract_cookies_to_file() -> Optional[str]:
     """
     Extract browser cookies to a Netscape cookie file ONCE.
     This is the slow operation - only called at startup or when cache expires.
     Returns the path to the cookie file, or None if extraction failed.
     """
-    import sys
+    import yt_dlp
     # Check if already valid (manual cookie file takes priority)
     if is_cookie_file_valid():
         source = _cookie_state.get("file_path", "unknown") 
-        print(f"🍪 [COOKIE] Using cookie file: {source} (extracted {_cookie_state['extracted_at']})")
-        sys.stdout.flush()
+        logger.info("🍪 [COOKIE] Using cookie file: %s (extracted %s)", source, _cookie_state["extracted_at"])
         return _cookie_state["file_path"]
     
-    # Lock to prevent concurrent extractions
-    if COOKIE_LOCK_FILE.exists():
-        print("🍪 [COOKIE] Another process is extracting cookies, waiting...")
-        import time
-        for _ in range(30):  # Wait up to 30 seconds
-            time.sleep(1)
+    # Lock to prevent concurrent extractions. The lock dies with its process
+    # on a crash; a live holder that hangs is given up on after a deadline.
+    lock_fd = None
+    if fcntl is not None:
+        lock_fd = os.open(COOKIE_LOCK_FILE, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            logger.info("🍪 [COOKIE] Another process is extracting cookies, waiting...")
+            deadline = time.monotonic() + COOKIE_LOCK_TIMEOUT_SEC
+            if not _flock_until(lock_fd, fcntl.LOCK_SH, deadline):
+                os.close(lock_fd)
+                logger.warning("🍪 [COOKIE] Lock timeout, proceeding without cookies")
+                return None
             if is_cookie_file_valid():
-                return str(COOKIE_FILE)
-        print("🍪 [COOKIE] Lock timeout, proceeding anyway")
+                os.close(lock_fd)
+                return _cookie_state["file_path"]
+            # The other extraction failed; take over
+            if not _flock_until(lock_fd, fcntl.LOCK_EX, deadline):
+                os.close(lock_fd)
+                logger.warning("🍪 [COOKIE] Lock timeout, proceeding without cookies")
+                return None
     
     try:
-        COOKIE_LOCK_FILE.touch()
-        
         preferred = settings.browser_for_cookies or "brave"
         browsers_to_try = [preferred] + [b for b in BROWSERS if b != preferred]
         
-        print(f"🍪 [COOKIE] Extracting cookies from browser (one-time operation)...")
+        logger.info("🍪 [COOKIE] Extracting cookies from browser (one-time operation)...")
         
         for browser in browsers_to_try:
             try:
@@ -154,33 +239,39 @@ def extract_cookies_to_file() -> Optional[str]:
                     _cookie_state["file_path"] = str(COOKIE_FILE)
                     _cookie_state["extracted_at"] = datetime.now()
                     _cookie_state["browser"] = browser
-                    print(f"✅ [COOKIE] Extracted cookies from {browser} to {COOKIE_FILE}")
+                    logger.info("✅ [COOKIE] Extracted cookies from %s to %s", browser, COOKIE_FILE)
                     return str(COOKIE_FILE)
                     
             except Exception as e:
-                print(f"⚠️ [COOKIE] Failed to extract from {browser}: {str(e)[:80]}")
+                logger.warning("⚠️ [COOKIE] Failed to extract from %s: %s", browser, str(e)[:80])
                 continue
         
-        print("❌ [COOKIE] All browser extractions failed. Proceeding without cookies.")
+        logger.warning("❌ [COOKIE] All browser extractions failed. Proceeding without cookies.")
         return None
         
     finally:
-        if COOKIE_LOCK_FILE.exists():
-            COOKIE_LOCK_FILE.unlink()
+        if lock_fd is not None:
+            os.close(lock_fd)  # releases the flock
+
 
+@lru_cache(maxsize=4)
+def _build_cookie_opts(cookie_file: Optional[str], proxy_url: Optional[str]) -> Mapping[str, Any]:
+    opts: Dict[str, Any] = {}
+    if proxy_url:
+        opts["proxy"] = proxy_url
+    if cookie_file:
+        opts["cookiefile"] = cookie_file
+    return MappingProxyType(opts)
 
-def get_yt_dlp_cookie_opts() -> Dict[str, Any]:
+
+def get_yt_dlp_cookie_opts() -> Mapping[str, Any]:
     """
     Returns yt-dlp options using the PRE-EXTRACTED cookie file and proxy.
-    This is O(1) - just returns a file path reference and proxy.
+    This is O(1) - the options are memoized per (cookie file, proxy) pair.
+    The result is read-only; merge it into your own dict before mutating.
     """
-    opts = get_yt_dlp_proxy_opt()
-    
-    # If we have a valid cookie file, use it
-    if is_cookie_file_valid() and _cookie_state["file_path"]:
-        opts["cookiefile"] = _cookie_state["file_path"]
-    
-    return opts
+    cookie_file = _cookie_state["file_path"] if is_cookie_file_valid() else None
+    return _build_cookie_opts(cookie_file, settings.proxy_url)
 
 
 def get_cached_browser() -> Optional[str]:
@@ -188,6 +279,75 @@ def get_cached_browser() -> Optional[str]:
     return _cookie_state.get("browser")
 
 
+# Idle YoutubeDL instances keyed by option signature. Building one loads the
+# extractor registry and cookie jar (tens of ms), so metadata extractions with
+# identical options reuse instances. YoutubeDL is not safe to use from two
+# threads at once, so each call checks one out exclusively (building a fresh
+# one when every cached instance is busy) and hands it back afterwards.
+_YDL_CACHE_SIZE = 8  # option signatures kept
+_YDL_IDLE_PER_KEY = 4  # idle instances kept per signature
+_ydl_cache: "OrderedDict[Any, list]" = OrderedDict()
+_ydl_cache_lock = threading.Lock()
+
+
+def _freeze(value: Any) -> Any:
+    """Turn an options dict into a hashable signature."""
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, set):
+        return frozenset(_freeze(v) for v in value)
+    return value
+
+
+def _run_ydl(opts: Dict[str, Any], url: str, download: bool) -> Any:
+    """Run one yt-dlp call, reusing a cached instance for metadata extraction."""
+    import yt_dlp  # deferred: importing the app shouldn't pay for yt-dlp's load
+    if download:
+        # Downloads carry per-task hooks/output templates; don't keep them alive
+        with yt_dlp.YoutubeDL(opts) as ydl:
+            return ydl.download([url])
+
+    # Cookie refreshes change extracted_at, so stale cookie jars age out
+    key = (_freeze(opts), _cookie_state["extracted_at"])
+    ydl = None
+    with _ydl_cache_lock:
+        idle = _ydl_cache.get(key)
+        if idle:
+            ydl = idle.pop()
+            _ydl_cache.move_to_end(key)
+    if ydl is None:
+        ydl = yt_dlp.YoutubeDL(opts)
+
+    try:
+        return ydl.extract_info(url, download=False)
+    finally:
+        _checkin_ydl(key, ydl)
+
+
+def _checkin_ydl(key: Any, ydl: Any) -> None:
+    """Return an instance to the idle pool, closing whatever doesn't fit."""
+    retired = []
+    with _ydl_cache_lock:
+        idle = _ydl_cache.get(key)
+        if idle is None:
+            idle = _ydl_cache[key] = []
+            while len(_ydl_cache) > _YDL_CACHE_SIZE:
+                retired.extend(_ydl_cache.popitem(last=False)[1])
+        else:
+            _ydl_cache.move_to_end(key)
+        if len(idle) < _YDL_IDLE_PER_KEY:
+            idle.append(ydl)
+        else:
+            retired.append(ydl)
+    for old in retired:
+        try:
+            old.close()  # releases its request handlers / pooled sessions
+        except Exception:
+            pass
+
+
 def run_yt_dlp_with_fallback(opts: Dict[str, Any], url: str, download: bool = False) -> Any:
     """
     Executes yt-dlp extraction/download using cached cookie file.
@@ -205,10 +365,7 @@ def run_yt_dlp_with_fallback(opts: Dict[str, Any], url: str, download: bool = Fa
             current_opts["proxy"] = settings.proxy_url
         
         try:
-            with yt_dlp.YoutubeDL(current_opts) as ydl:
-                if download:
-                    return ydl.download([url])
-                return ydl.extract_info(url, download=False)
+            return _run_ydl(current_opts, url, download)
         except Exception as e:
             if "cookies" in str(e).lower() or "bot" in str(e).lower():
                 print("⚠️ [COOKIE] Cookie file may be stale, attempting refresh...")
@@ -232,10 +389,7 @@ def run_yt_dlp_with_fallback(opts: Dict[str, Any], url: str, download: bool = Fa
             if settings.proxy_url:
                 current_opts["proxy"] = settings.proxy_url
             
-            with yt_dlp.YoutubeDL(current_opts) as ydl:
-                if download:
-                    return ydl.download([url])
-                return ydl.extract_info(url, download=False)
+            return _run_ydl(current_opts, url, download)
                 
         except Exception as e:
             last_exc = e
@@ -244,11 +398,19 @@ def run_yt_dlp_with_fallback(opts: Dict[str, Any], url: str, download: bool = Fa
     # Final fallback: No cookies
     fallback_opts = {k: v for k, v in opts.items() if k not in ["cookiesfrombrowser", "cookiefile"]}
     try:
-        with yt_dlp.YoutubeDL(fallback_opts) as ydl:
-            if download:
-                return ydl.download([url])
-            return ydl.extract_info(url, download=False)
+        return _run_ydl(fallback_opts, url, download)
     except Exception as e:
         if last_exc and "confirm you're not a bot" in str(e):
             raise last_exc
         raise e
+
+
+# Caps concurrent off-loop extractions so a burst of requests can't exhaust
+# the default thread pool (and YouTube's patience) all at once
+_EXTRACT_SEM = asyncio.Semaphore(8)
+
+
+async def arun_yt_dlp_with_fallback(opts: Dict[str, Any], url: str, download: bool = False) -> Any:
+    """Async wrapper: runs run_yt_dlp_with_fallback in a worker thread."""
+    async with _EXTRACT_SEM:
+        return await asyncio.to_thread(run_yt_dlp_with_fallback, opts, url, download)
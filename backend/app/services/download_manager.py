@@ -1,26 +1,54 @@
 from __future__ import annotations
 
-import gc
-import json
+import os
 import re
 import shutil
+import sys
 import tempfile
 import threading
 import time
 import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
+from operator import itemgetter
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Tuple
 
 
-import yt_dlp
+import orjson
 from fastapi import HTTPException
 
 from ..schemas import DownloadRequest, LibraryFile, ProgressPayload
 from ..config import settings
 from .cookie_helper import get_yt_dlp_cookie_opts, run_yt_dlp_with_fallback
+from .file_scan import iter_files
 from .formatting import format_speed
 
+_IS_WINDOWS = sys.platform == "win32"
+
+_MEDIA_EXTENSIONS = frozenset({".mp3", ".mp4", ".m4a", ".webm", ".opus", ".ogg"})
+_AUDIO_EXTENSIONS = frozenset({".mp3", ".m4a", ".opus", ".ogg"})
+
+_ANSI_RE = re.compile(r'\x1b\[[0-9;]*m')
+_FNAME_INVALID_RE = re.compile(r'[\\/*?:"<>|]')
+_DIGITS_RE = re.compile(r"(\d+)")
+
+_PROGRESS_INTERVAL = 0.2  # Seconds between "downloading" progress updates
+
+# Priority: Opus > AAC > any audio codec > bestaudio > best (for HLS-only)
+_AUDIO_FORMAT = "/".join((
+    "bestaudio[acodec=opus]",
+    "bestaudio[acodec=aac]",
+    "bestaudio[ext=webm]",
+    "bestaudio[ext=m4a]",
+    "bestaudio[acodec!=none]",
+    "bestaudio",
+    "best",
+))
+
+_SEARCH_TTL = 600.0  # Seconds a search result list is reused
+_SEARCH_CACHE_SIZE = 512
 
 
 class DownloadManager:
@@ -33,19 +61,33 @@ class DownloadManager:
         self.progress: Dict[str, ProgressPayload] = {}
         self.stop_signals: Dict[str, threading.Event] = {}
         self.lock = threading.Lock()
-        self._active_downloads: Dict[str, threading.Thread] = {}
+        self._active_downloads: Dict[str, Future] = {}
+        self._running = 0
+        # task_id -> monotonic finish time, oldest first
+        self._finished: OrderedDict[str, float] = OrderedDict()
+        self._file_cache: Dict[str, Tuple[tuple, LibraryFile]] = {}
+        # (normalized query, limit) -> (monotonic cached_at, entries), LRU order
+        self._search_cache: OrderedDict[tuple, Tuple[float, List[Dict[str, Any]]]] = OrderedDict()
+        # Jobs beyond the cap wait in the executor's work queue instead of
+        # racing for bandwidth on their own threads.
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.MAX_CONCURRENT_DOWNLOADS,
+            thread_name_prefix="ytdl",
+        )
 
     @property
     def active_download_count(self) -> int:
-        """Return number of currently active downloads."""
-        with self.lock:
-            return len([t for t in self._active_downloads.values() if t.is_alive()])
+        """Return number of currently running downloads."""
+        return self._running
 
     def start(self, request: DownloadRequest) -> str:
+        self._evict_old()
         task_id = str(uuid.uuid4())
         
-        # Check if we're at the concurrent limit
-        if self.active_download_count >= self.MAX_CONCURRENT_DOWNLOADS:
+        # Submitted-but-unfinished jobs beyond the worker count will queue
+        with self.lock:
+            pending = len(self._active_downloads)
+        if pending >= self.MAX_CONCURRENT_DOWNLOADS:
             self.progress[task_id] = ProgressPayload(
                 status="starting", 
                 percent=0.0, 
@@ -57,18 +99,42 @@ class DownloadManager:
         stop_event = threading.Event()
         self.stop_signals[task_id] = stop_event
 
-        thread = threading.Thread(
-            target=self._run_download,
-            args=(task_id, request, stop_event),
-            daemon=True,
-        )
-        
+        future = self._executor.submit(self._run_slot, task_id, request, stop_event)
         with self.lock:
-            self._active_downloads[task_id] = thread
-        
-        thread.start()
+            self._active_downloads[task_id] = future
+        future.add_done_callback(lambda _f: self._forget(task_id))
         return task_id
 
+    def _run_slot(
+        self,
+        task_id: str,
+        request: DownloadRequest,
+        stop_event: threading.Event,
+    ) -> None:
+        with self.lock:
+            self._running += 1
+        try:
+            self._run_download(task_id, request, stop_event)
+        finally:
+            with self.lock:
+                self._running -= 1
+                self._finished[task_id] = time.monotonic()
+
+    def _evict_old(self) -> None:
+        """Drop progress for downloads that finished more than the TTL ago."""
+        cutoff = time.monotonic() - settings.progress_ttl_sec
+        with self.lock:
+            while self._finished:
+                task_id, finished_at = next(iter(self._finished.items()))
+                if finished_at > cutoff:
+                    break
+                self._finished.popitem(last=False)
+                self.progress.pop(task_id, None)
+
+    def _forget(self, task_id: str) -> None:
+        with self.lock:
+            self._active_downloads.pop(task_id, None)
+
 
     def cancel(self, task_id: str) -> None:
         stop_event = self.stop_signals.get(task_id)
@@ -76,58 +142,89 @@ class DownloadManager:
             raise HTTPException(status_code=404, detail="Task not found.")
         stop_event.set()
 
+    def shutdown(self) -> None:
+        """Signal every download to stop and drop queued jobs without waiting."""
+        for stop_event in list(self.stop_signals.values()):
+            stop_event.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
     def get_progress(self, task_id: str) -> ProgressPayload:
+        self._evict_old()
         progress = self.progress.get(task_id)
         if not progress:
             raise HTTPException(status_code=404, detail="Task not found.")
         return progress
 
     def list_files(self) -> List[LibraryFile]:
-        files: List[LibraryFile] = []
-        for path in self.downloads_dir.rglob("*"):
-            if not path.is_file():
+        files: List[Tuple[int, LibraryFile]] = []
+        seen: set = set()
+        for entry in iter_files(self.downloads_dir, _MEDIA_EXTENSIONS):
+            try:
+                st = entry.stat()
+            except OSError:
                 continue
-            if path.suffix.lower() not in {".mp3", ".mp4", ".m4a", ".webm", ".opus", ".ogg"}:
+            meta_name = entry.path + ".meta.json"
+            try:
+                meta_mtime = os.stat(meta_name).st_mtime_ns
+            except OSError:
+                meta_mtime = None
+
+            # Unchanged media + sidecar -> reuse the previously built entry
+            key = (st.st_mtime_ns, st.st_size, meta_mtime)
+            seen.add(entry.path)
+            cached = self._file_cache.get(entry.path)
+            if cached is not None and cached[0] == key:
+                files.append((st.st_mtime_ns, cached[1]))
                 continue
-            rel_path = path.relative_to(self.downloads_dir)
-            size_mb = path.stat().st_size / (1024 * 1024)
-            file_type = "audio" if path.suffix.lower() in {".mp3", ".m4a", ".opus", ".ogg"} else "video"
-            
+
             # Try to read source URL and thumbnail from metadata file
-            source_url = None
-            thumbnail = None
-            meta_path = path.with_suffix(path.suffix + ".meta.json")
-            if meta_path.exists():
+            metadata: Dict[str, Any] = {}
+            if meta_mtime is not None:
                 try:
-                    with open(meta_path, "r", encoding="utf-8") as f:
-                        metadata = json.load(f)
-                        source_url = metadata.get("source_url")
-                        thumbnail = metadata.get("thumbnail")
-                        title = metadata.get("title")
-                        artist = metadata.get("artist")
+                    with open(meta_name, "rb") as f:
+                        parsed = orjson.loads(f.read())
+                    if isinstance(parsed, dict):  # valid JSON but not an object -> ignore
+                        metadata = parsed
                 except Exception:
                     pass  # Ignore metadata read errors
-            
-            files.append(
-                LibraryFile(
-                    name=path.name,
-                    path=rel_path,
-                    size_mb=round(size_mb, 2),
-                    type=file_type,
-                    modified_at=datetime.fromtimestamp(path.stat().st_mtime),
-                    source_url=source_url,
-                    thumbnail=thumbnail,
-                    title=title,
-                    artist=artist,
-                )
+
+            path = Path(entry.path)
+            item = LibraryFile.model_construct(
+                name=entry.name,
+                path=path.relative_to(self.downloads_dir),
+                size_mb=round(st.st_size / (1024 * 1024), 2),
+                type="audio" if path.suffix.lower() in _AUDIO_EXTENSIONS else "video",
+                modified_at=datetime.fromtimestamp(st.st_mtime),
+                source_url=metadata.get("source_url"),
+                thumbnail=metadata.get("thumbnail"),
+                title=metadata.get("title"),
+                artist=metadata.get("artist"),
             )
-        files.sort(key=lambda f: f.modified_at, reverse=True)
-        return files
+            self._file_cache[entry.path] = (key, item)
+            files.append((st.st_mtime_ns, item))
+
+        # Drop entries for files that were deleted or moved
+        for stale in self._file_cache.keys() - seen:
+            self._file_cache.pop(stale, None)
+
+        # Sort on the integer mtimes rather than comparing datetimes
+        files.sort(key=itemgetter(0), reverse=True)
+        return [item for _, item in files]
 
 
 
     def search(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
         """Search YouTube for music tracks and return basic metadata."""
+        key = (query.strip().lower(), limit)
+        now = time.monotonic()
+        with self.lock:
+            cached = self._search_cache.get(key)
+            if cached is not None:
+                if now - cached[0] < _SEARCH_TTL:
+                    self._search_cache.move_to_end(key)
+                    return cached[1]
+                self._search_cache.pop(key, None)
+
         ydl_opts = {
             "quiet": True,
             "no_warnings": True,
@@ -157,6 +254,10 @@ class DownloadManager:
                     "url": f"https://www.youtube.com/watch?v={entry.get('id')}",
                     "source": "youtube"
                 })
+            with self.lock:
+                self._search_cache[key] = (now, entries)
+                if len(self._search_cache) > _SEARCH_CACHE_SIZE:
+                    self._search_cache.popitem(last=False)
             return entries
         except Exception as e:
             print(f"Search failed: {e}")
@@ -174,16 +275,27 @@ class DownloadManager:
             if not shutil.which("ffmpeg"):
                 raise RuntimeError("FFmpeg not found in PATH.")
 
+            last_emit = [0.0]
+
             def hook(d: Dict[str, Any]) -> None:
                 if stop_event.is_set():
                     raise Exception("Download cancelled by user.")
                 if d["status"] == "downloading":
-                    percent_str = d.get("_percent_str", "0%")
-                    # Strip ANSI codes, then whitespace, then %
-                    percent_str = re.sub(r'\x1b\[[0-9;]*m', '', percent_str).strip().rstrip('%')
-                    percent = float(percent_str or 0)
+                    # yt-dlp calls back per chunk; the poll endpoint only needs ~5 Hz
+                    now = time.monotonic()
+                    if now - last_emit[0] < _PROGRESS_INTERVAL:
+                        return
+                    last_emit[0] = now
+
                     total_bytes = d.get("total_bytes") or d.get("total_bytes_estimate")
                     downloaded_bytes = d.get("downloaded_bytes", 0)
+                    if total_bytes and downloaded_bytes is not None:
+                        percent = min(downloaded_bytes * 100.0 / total_bytes, 100.0)
+                    else:
+                        percent_str = d.get("_percent_str", "0%")
+                        # Strip ANSI codes, then whitespace, then %
+                        percent_str = _ANSI_RE.sub('', percent_str).strip().rstrip('%')
+                        percent = float(percent_str or 0)
                     
                     size_mb = (total_bytes / (1024 * 1024)) if total_bytes else None
                     downloaded_mb = (downloaded_bytes / (1024 * 1024)) if downloaded_bytes else None
@@ -209,7 +321,7 @@ class DownloadManager:
 
             # Determine output template
             def sanitize_filename(v):
-                return re.sub(r'[\\/*?:"<>|]', "", v)
+                return _FNAME_INVALID_RE.sub("", v)
 
             ydl_opts = {
                 "quiet": False,
@@ -246,28 +358,16 @@ class DownloadManager:
                 if request.quality.isdigit():
                     preferred_quality = request.quality
                 elif "kbps" in request.quality.lower():
-                    match = re.search(r"(\d+)", request.quality)
+                    match = _DIGITS_RE.search(request.quality)
                     if match:
                         preferred_quality = match.group(1)
                 elif request.quality == "best":
                     preferred_quality = "320"
                 
-                # Audio-only format selector with fallback to video for extraction
-                # Priority: Opus > AAC > any audio codec > bestaudio > best (for HLS-only)
-                # FFmpeg will extract audio from video if we fall back to 'best'
-                audio_format_string = (
-                    "bestaudio[acodec=opus]/bestaudio[acodec=aac]/"
-                    "bestaudio[ext=webm]/bestaudio[ext=m4a]/"
-                    "bestaudio[acodec!=none]/bestaudio/best"  # /best fallback for HLS-only videos
-                )
-                
-                # If user consents to video fallback, add it as last resort
-                allow_fallback = getattr(request, 'allow_video_fallback', False)
-                if allow_fallback:
-                    audio_format_string += "/best"
-                
-                # Always add /best fallback for HLS-only videos that only have muxed streams
-                ydl_opts["format"] = audio_format_string + "/best"
+                # Audio-only selector; the terminal "best" lets FFmpeg extract audio
+                # from muxed streams on HLS-only videos (which also covers
+                # allow_video_fallback)
+                ydl_opts["format"] = _AUDIO_FORMAT
                 ydl_opts["postprocessors"] = []
                 
                 # CONDITIONAL POST-PROCESSING (convert to user's requested format)
@@ -346,10 +446,19 @@ class DownloadManager:
                 counter += 1
 
             print(f"Moving file: {temp_file} -> {final_path}")
-            # Ensure all file handles are released before moving
-            gc.collect()
-            time.sleep(1)  # Give FFmpeg time to fully release the file
-            shutil.move(str(temp_file), final_path)
+            if _IS_WINDOWS:
+                # FFmpeg may still hold the file briefly after exiting; back off
+                # on sharing violations instead of stalling a fixed second
+                for delay in (0.05, 0.1, 0.2, 0.4, 0.8):
+                    try:
+                        shutil.move(str(temp_file), final_path)
+                        break
+                    except PermissionError:
+                        time.sleep(delay)
+                else:
+                    shutil.move(str(temp_file), final_path)
+            else:
+                shutil.move(str(temp_file), final_path)
             file_size_mb = final_path.stat().st_size / (1024 * 1024)
             print(f"Download completed: {final_path} ({file_size_mb:.2f} MB)")
             
@@ -364,16 +473,13 @@ class DownloadManager:
                 "artist": request.artist,
                 "thumbnail": request.thumbnail if hasattr(request, 'thumbnail') else None
             }
-            with open(meta_path, "w", encoding="utf-8") as f:
-                json.dump(metadata, f, indent=2)
+            meta_path.write_bytes(orjson.dumps(metadata, option=orjson.OPT_INDENT_2))
             
             # Make the metadata file hidden on Windows
-            try:
+            if _IS_WINDOWS:
                 import ctypes
                 FILE_ATTRIBUTE_HIDDEN = 0x02
                 ctypes.windll.kernel32.SetFileAttributesW(str(meta_path), FILE_ATTRIBUTE_HIDDEN)
-            except Exception:
-                pass  # Ignore errors on non-Windows systems
 
             
             self.progress[task_id] = ProgressPayload(
@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from typing import Iterator, AbstractSet
+
+
+def iter_files(root: Path, extensions: AbstractSet[str]) -> Iterator[os.DirEntry]:
+    """Recursively yield regular files under ``root`` whose lowercased
+    extension (including the dot) is in ``extensions``.
+
+    Uses ``os.scandir`` so type checks come from cached dirent data and each
+    caller can issue a single ``entry.stat()``.
+    """
+    stack = [os.fspath(root)]
+    while stack:
+        try:
+            it = os.scandir(stack.pop())
+        except OSError:
+            continue
+        with it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                        continue
+                    if not entry.is_file():
+                        continue
+                except OSError:
+                    continue
+                name = entry.name
+                dot = name.rfind(".")
+                if dot > 0 and name[dot:].lower() in extensions:
+                    yield entry
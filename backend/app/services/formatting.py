@@ -1,16 +1,21 @@
 from __future__ import annotations
 
-from datetime import timedelta
+from bisect import bisect_right
+from functools import lru_cache
 
+_SPEED_THRESHOLDS = (1 << 10, 1 << 20, 1 << 30)
+_SPEED_DIVISORS = (1, 1 << 10, 1 << 20, 1 << 30)
+_SPEED_SUFFIXES = ("B/s", "KB/s", "MB/s", "GB/s")
 
+
+@lru_cache(maxsize=4096)  # track lengths repeat; a few thousand distinct values
 def format_duration(seconds: int | None) -> str:
     if seconds is None:
         return "00:00"
-    seconds = int(seconds)
-    dt = timedelta(seconds=seconds)
-    total_minutes, secs = divmod(dt.seconds, 60)
-    hours, minutes = divmod(total_minutes, 60)
-    if dt.days or hours:
+    days, rem = divmod(int(seconds), 86400)
+    hours, rem = divmod(rem, 3600)
+    minutes, secs = divmod(rem, 60)
+    if days or hours:
         return f"{hours:02d}:{minutes:02d}:{secs:02d}"
     return f"{minutes:02d}:{secs:02d}"
 
@@ -28,11 +33,7 @@ def format_views(views: int | None) -> str:
 def format_speed(bytes_per_sec: float | None) -> str:
     if not bytes_per_sec:
         return "0 B/s"
-    units = ["B/s", "KB/s", "MB/s", "GB/s"]
-    unit_index = 0
-    while bytes_per_sec >= 1024 and unit_index < len(units) - 1:
-        bytes_per_sec /= 1024
-        unit_index += 1
-    return f"{bytes_per_sec:.1f} {units[unit_index]}"
+    i = bisect_right(_SPEED_THRESHOLDS, bytes_per_sec)
+    return f"{bytes_per_sec / _SPEED_DIVISORS[i]:.1f} {_SPEED_SUFFIXES[i]}"
 
 
@@ -1,20 +1,27 @@
-import json
+import asyncio
 import logging
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, List, Optional
 from datetime import datetime
+
+import orjson
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
 from ..models.library import LibraryTrack
 from ..config import settings
+from .file_scan import iter_files
 
 logger = logging.getLogger(__name__)
 
+# Stay well under SQLite's bound-parameter limit per IN (...) query
+_PATH_BATCH = 500
+_METADATA_CONCURRENCY = 32
+
 class LibrarySyncService:
     def __init__(self, downloads_dir: Path):
         self.downloads_dir = downloads_dir
-        self.supported_extensions = {'.mp3', '.m4a', '.opus', '.flac', '.wav', '.mp4', '.mkv', '.webm'}
+        self.supported_extensions = frozenset({'.mp3', '.m4a', '.opus', '.flac', '.wav', '.mp4', '.mkv', '.webm'})
 
     async def sync_library(self, db: AsyncSession) -> dict:
         """
@@ -23,29 +30,36 @@ class LibrarySyncService:
         if not self.downloads_dir.exists():
             return {"status": "error", "message": "Downloads directory does not exist"}
 
-        found_files = []
-        for path in self.downloads_dir.rglob("*"):
-            if path.is_file() and path.suffix.lower() in self.supported_extensions:
-                found_files.append(path)
+        found_files = await asyncio.to_thread(self._scan_files)
+
+        rel_paths = [str(p.relative_to(self.downloads_dir)) for p in found_files]
+
+        # One IN (...) query per batch instead of a SELECT per file
+        existing: Dict[str, LibraryTrack] = {}
+        for i in range(0, len(rel_paths), _PATH_BATCH):
+            chunk = rel_paths[i:i + _PATH_BATCH]
+            result = await db.execute(
+                select(LibraryTrack).where(LibraryTrack.path.in_(chunk))
+            )
+            for t in result.scalars():
+                existing.setdefault(t.path, t)
+
+        # Sidecar reads are blocking; fan them out across worker threads,
+        # bounded so huge libraries don't exhaust file descriptors
+        sem = asyncio.Semaphore(_METADATA_CONCURRENCY)
 
-        new_tracks_count = 0
+        async def load(p: Path) -> dict:
+            async with sem:
+                return await asyncio.to_thread(self._load_metadata, p)
+
+        metadatas = await asyncio.gather(*(load(p) for p in found_files))
+
+        new_tracks: List[LibraryTrack] = []
         updated_tracks_count = 0
-        
-        for file_path in found_files:
-            # Calculate relative path from downloads_dir
-            try:
-                rel_path = str(file_path.relative_to(self.downloads_dir))
-            except ValueError:
-                continue
-
-            # Check if already in DB (by path)
-            query = select(LibraryTrack).where(LibraryTrack.path == rel_path)
-            result = await db.execute(query)
-            track = result.scalar_one_or_none()
-
-            # Try to load metadata
-            metadata = self._load_metadata(file_path)
-            
+
+        for file_path, rel_path, metadata in zip(found_files, rel_paths, metadatas):
+            track = existing.get(rel_path)
+
             title = metadata.get("title") or file_path.stem
             artist = metadata.get("artist") or "Unknown Artist"
             youtube_id = metadata.get("youtube_id") or metadata.get("id") # ytdlp often uses id
@@ -66,8 +80,7 @@ class LibrarySyncService:
                     is_offline=True,
                     local_path=str(file_path.absolute())
                 )
-                db.add(track)
-                new_tracks_count += 1
+                new_tracks.append(track)
             else:
                 # Update existing entry if metadata found and it was missing
                 updated = False
@@ -84,14 +97,22 @@ class LibrarySyncService:
                 if updated:
                     updated_tracks_count += 1
 
+        db.add_all(new_tracks)
         await db.commit()
         return {
             "status": "success",
             "files_scanned": len(found_files),
-            "new_tracks_added": new_tracks_count,
+            "new_tracks_added": len(new_tracks),
             "tracks_updated": updated_tracks_count
         }
 
+    def _scan_files(self) -> List[Path]:
+        """Walk downloads_dir for supported media (blocking; run in a thread)."""
+        return [
+            Path(entry.path)
+            for entry in iter_files(self.downloads_dir, self.supported_extensions)
+        ]
+
     def _load_metadata(self, file_path: Path) -> dict:
         """Attempts to load metadata from a .meta.json file."""
         meta_path = file_path.with_suffix(file_path.suffix + ".meta.json")
@@ -102,8 +123,7 @@ class LibrarySyncService:
                 return {}
 
         try:
-            with open(meta_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            return orjson.loads(meta_path.read_bytes())
         except Exception as e:
             logger.warning(f"Failed to load metadata for {file_path}: {e}")
             return {}
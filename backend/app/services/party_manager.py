@@ -1,6 +1,7 @@
 from __future__ import annotations
 import asyncio
-from datetime import datetime
+import time
+from datetime import datetime, timezone
 from typing import Dict, List, Optional, Any
 from pydantic import BaseModel
 from ..schemas import QueueTrack, PartySessionState
@@ -13,9 +14,10 @@ class PartySession:
         self.current_index: int = -1
         self.is_playing: bool = False
         self.is_locked: bool = False
-        self.votes: set[str] = set()  # Set of user_ids who voted to skip
-        self.active_users: set[str] = set() # Set of unique user_ids seen this session
-        self.last_updated = datetime.utcnow()
+        # Immutable snapshots: writers swap in a new frozenset, readers never lock
+        self.votes: frozenset[str] = frozenset()  # user_ids who voted to skip
+        self.active_users: frozenset[str] = frozenset()  # unique user_ids seen this session
+        self.last_updated = time.time()  # epoch seconds; datetime built in to_state
         self.lock = asyncio.Lock()
 
     def to_state(self) -> PartySessionState:
@@ -26,9 +28,13 @@ class PartySession:
             current_index=self.current_index,
             is_playing=self.is_playing,
             is_locked=self.is_locked,
-            updated_at=self.last_updated
+            # Naive UTC, as the former datetime.utcnow() values were
+            updated_at=datetime.fromtimestamp(self.last_updated, timezone.utc).replace(tzinfo=None)
         )
 
+_LOCK_SHARDS = 16
+
+
 class PartyManager:
     _instance = None
 
@@ -42,12 +48,17 @@ class PartyManager:
         if self._initialized:
             return
         self.sessions: Dict[str, PartySession] = {}
-        self._global_lock = asyncio.Lock()
+        # Create/end only contend with sessions hashing to the same shard;
+        # plain dict reads (get_session etc.) take no lock at all.
+        self._shard_locks = [asyncio.Lock() for _ in range(_LOCK_SHARDS)]
         self._initialized = True
         print("🎉 [PARTY] PartyManager Initialized")
 
+    def _shard_lock(self, session_id: str) -> asyncio.Lock:
+        return self._shard_locks[hash(session_id) % _LOCK_SHARDS]
+
     async def create_session(self, session_id: str, host_id: str) -> PartySession:
-        async with self._global_lock:
+        async with self._shard_lock(session_id):
             # Cleanup old sessions if needed (simple TTL could be added)
             session = PartySession(session_id, host_id)
             self.sessions[session_id] = session
@@ -57,7 +68,7 @@ class PartyManager:
         return self.sessions.get(session_id)
 
     async def end_session(self, session_id: str, host_id: str):
-        async with self._global_lock:
+        async with self._shard_lock(session_id):
             if session_id in self.sessions:
                 if self.sessions[session_id].host_id == host_id:
                     del self.sessions[session_id]
@@ -75,14 +86,14 @@ class PartyManager:
             if "current_index" in data:
                 # If current index changes, clear votes for new track
                 if session.current_index != data["current_index"]:
-                    session.votes.clear()
+                    session.votes = frozenset()
                 session.current_index = data["current_index"]
             if "is_playing" in data:
                 session.is_playing = data["is_playing"]
             if "is_locked" in data:
                 session.is_locked = data["is_locked"]
             
-            session.last_updated = datetime.utcnow()
+            session.last_updated = time.time()
             return session.to_state()
 
     async def cast_vote(self, session_id: str, user_id: str):
@@ -90,28 +101,25 @@ class PartyManager:
         if not session:
             return None
         
-        async with session.lock:
-            session.active_users.add(user_id)
-            session.votes.add(user_id)
-            
-            # Simple threshold: 50% of active users (min 2 for skip)
-            # If only 1 user, skip immediately if they vote? 
-            # Or always require majority of at least 2 for "vibe" protection
-            threshold = max(1, (len(session.active_users) + 1) // 2)
-            
-            should_skip = len(session.votes) >= threshold
-            
-            if should_skip:
-                # Backend doesn't advance index automatically to avoid sync issues with host
-                # Instead it returns skipped=True and let the host advance or use a signal
-                pass
-            
-            session.last_updated = datetime.utcnow()
-            return {
-                "votes": len(session.votes),
-                "threshold": threshold,
-                "should_skip": should_skip
-            }
+        # No await between read and swap, so this can't interleave with other
+        # coroutines and needs no lock; repeat voters skip the set rebuild
+        if user_id not in session.active_users:
+            session.active_users = session.active_users | {user_id}
+        if user_id not in session.votes:
+            session.votes = session.votes | {user_id}
+
+        # Simple threshold: 50% of active users, rounded up. The voter is
+        # always in active_users, so (n + 1) >> 1 is already >= 1.
+        # Backend doesn't advance index automatically to avoid sync issues with host;
+        # it returns should_skip and lets the host advance
+        votes = len(session.votes)
+        threshold = (len(session.active_users) + 1) >> 1
+        session.last_updated = time.time()
+        return {
+            "votes": votes,
+            "threshold": threshold,
+            "should_skip": votes >= threshold
+        }
 
     async def add_track(self, session_id: str, track: QueueTrack, position: Optional[int] = None):
         session = self.sessions.get(session_id)
@@ -124,7 +132,7 @@ class PartyManager:
             else:
                 session.queue.append(track)
             
-            session.last_updated = datetime.utcnow()
+            session.last_updated = time.time()
             return session.to_state()
 
 party_manager = PartyManager()
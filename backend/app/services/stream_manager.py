@@ -1,53 +1,73 @@
 """
 Onyx Stream Manager v2
 Ultra-low-latency extraction engine with:
-- Semaphore-guarded extractor pool (prevents concurrent mutation)
+- Pooled extractors (each YoutubeDL used by one coroutine at a time)
 - Deferred stream support (bytes flow as authorization completes)
 - TTL-pessimistic caching with safety margins
 - One-time cookie loading at startup
 """
-import yt_dlp
 import asyncio
+import logging
+import sys
 import time
-from typing import Dict, Any, Optional, Callable
-from datetime import datetime, timedelta
-from dataclasses import dataclass, field
 from collections import OrderedDict
-import anyio
+from typing import TYPE_CHECKING, Dict, Any, List, Optional, Callable, Awaitable
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import islice
+from weakref import WeakValueDictionary
 
 from ..config import settings
 from .cookie_helper import get_yt_dlp_cookie_opts, FAST_EXTRACT_OPTS
 
-try:
-    from yt_dlp.utils import DownloadError
-except ImportError:
-    DownloadError = Exception
+if TYPE_CHECKING:
+    import yt_dlp
+
+logger = logging.getLogger(__name__)
 
+_BOT_DETECTION_MSG = (
+    "🤖 [%s] YouTube BOT DETECTION for %s!\n"
+    "   → Your cookies.txt is missing, expired, or invalid.\n"
+    "   → Re-export cookies from a logged-in browser."
+)
 
-@dataclass(order=True)
+
+@dataclass(slots=True)
 class ExtractionTask:
-    """Priority-ordered extraction task."""
+    """Queued extraction task."""
     priority: int  # 1 = urgent (play), 2 = near (queue), 3 = visible (viewport)
-    video_id: str = field(compare=False)
-    timestamp: float = field(default_factory=time.time, compare=False)
-    future: asyncio.Future = field(default_factory=asyncio.Future, compare=False)
+    video_id: str
+    future: asyncio.Future  # created on the running loop by _enqueue
+    timestamp: float = field(default_factory=time.time)
+
+
+_YOUTUBE_IE_KEY = "Youtube"  # yt_dlp.extractor.youtube.YoutubeIE.ie_key()
 
+_URL_TTL = 5 * 3600.0  # Pessimistic lifetime of a googlevideo URL
+_EXPIRY_MARGIN = 90.0  # Treat URLs as expired this many seconds early
+_SWEEP_INTERVAL = 30.0  # Seconds between background expiry sweeps
 
-@dataclass
+
+@dataclass(slots=True)
 class CachedURL:
     """Cached authorization artifact with pessimistic TTL."""
     url: str
-    expires_at: datetime
+    expires_at: float  # epoch seconds
     content_type: str = "audio/mp4"  # MIME type for proxy response
     thumbnail: Optional[str] = None
     duration: Optional[int] = None
     title: Optional[str] = None
     artist: Optional[str] = None
+    # Eviction bookkeeping: how often it was served and what it cost to make
+    hits: int = 0
+    extract_cost: float = 1.0  # seconds spent in yt-dlp
+    inserted_at: float = field(default_factory=time.time)
     
     @property
     def is_valid(self) -> bool:
         """Check if still valid with 90-second safety margin."""
-        return self.expires_at > datetime.now() + timedelta(seconds=90)
+        return self.expires_at > time.time() + _EXPIRY_MARGIN
 
 
 # Browser-safe progressive format IDs (itags) in priority order
@@ -55,6 +75,9 @@ class CachedURL:
 # Source: Harmony-Music's proven selection logic
 PROGRESSIVE_ITAGS = ["140", "251", "250", "249", "139"]
 
+# itag -> rank; doubles as the membership set for the single selection pass
+_ITAG_PRIORITY = {itag: i for i, itag in enumerate(PROGRESSIVE_ITAGS)}
+
 # MIME type mapping for browser playback
 ITAG_MIME_TYPES = {
     "140": "audio/mp4",   # m4a AAC 128kbps
@@ -80,103 +103,146 @@ def select_progressive_audio(info: Dict[str, Any]) -> Optional[Dict[str, Any]]:
     formats = info.get("formats", [])
     
     if not formats:
-        print(f"[FORMAT] FATAL: No formats available in extraction result")
+        logger.warning("[FORMAT] FATAL: No formats available in extraction result")
         return None
     
-    # Debug: Log available formats
-    print(f"[FORMAT] Analyzing {len(formats)} formats...")
-    
-    # Build lookup by format_id for O(1) access
-    format_lookup: Dict[str, Dict[str, Any]] = {}
+    # Single pass: track the best preferred itag plus the first audio-only and
+    # first any-audio progressive candidates for the fallbacks
+    best_prio = len(PROGRESSIVE_ITAGS)
+    selected = None
+    first_audio_only = None
+    first_any = None
     for fmt in formats:
-        fmt_id = str(fmt.get("format_id", ""))
-        protocol = fmt.get("protocol", "")
-        
-        # HARD REJECT HLS - This is non-negotiable
-        if protocol == "m3u8_native" or protocol == "m3u8":
-            continue  # Skip HLS entirely
-        
-        # REQUIRE https protocol for browser compatibility
-        if protocol != "https":
+        # HARD REJECT HLS and anything else non-https - non-negotiable
+        if fmt.get("protocol") != "https":
             continue
-            
-        # Must have audio codec
-        if fmt.get("acodec") in (None, "none", ""):
+        # Must have audio codec and a URL
+        if fmt.get("acodec") in (None, "none", "") or not fmt.get("url"):
             continue
-            
-        # Must have a URL
-        if not fmt.get("url"):
+
+        prio = _ITAG_PRIORITY.get(str(fmt.get("format_id", "")))
+        if prio is not None:
+            if prio < best_prio:
+                best_prio, selected = prio, fmt
+                if prio == 0:
+                    break
             continue
-            
-        format_lookup[fmt_id] = fmt
-    
-    print(f"[FORMAT] Found {len(format_lookup)} progressive candidates: {list(format_lookup.keys())[:10]}")
-    
-    # ITAG-BASED PRIORITY SELECTION (Harmony pattern)
-    selected = None
-    for itag in PROGRESSIVE_ITAGS:
-        if itag in format_lookup:
-            selected = format_lookup[itag]
-            print(f"[FORMAT] ✅ Selected itag {itag}: {selected.get('ext')}, "
-                  f"{selected.get('acodec')}, {selected.get('abr') or selected.get('tbr')}kbps")
-            break
-    
+        if first_any is None:
+            first_any = fmt
+        if first_audio_only is None and str(fmt.get("vcodec", "")).lower() == "none":
+            first_audio_only = fmt
+
+    if selected:
+        logger.debug("[FORMAT] ✅ Selected itag %s: %s, %s, %skbps",
+                     selected.get('format_id'), selected.get('ext'),
+                     selected.get('acodec'), selected.get('abr') or selected.get('tbr'))
     # Fallback: If no preferred itag found, try any progressive audio-only format
-    if not selected:
-        print(f"[FORMAT] Preferred itags not found, trying fallback...")
-        for fmt_id, fmt in format_lookup.items():
-            # Prefer audio-only (vcodec == none)
-            vcodec = str(fmt.get("vcodec", "")).lower()
-            if vcodec == "none":
-                selected = fmt
-                print(f"[FORMAT] ⚠️ Fallback selected: {fmt_id} ({fmt.get('ext')}, {fmt.get('acodec')})")
-                break
-    
+    elif first_audio_only:
+        selected = first_audio_only
+        logger.debug("[FORMAT] ⚠️ Fallback selected: %s (%s, %s)",
+                     selected.get('format_id'), selected.get('ext'), selected.get('acodec'))
     # Last resort: Any format with audio
-    if not selected and format_lookup:
-        fmt_id, fmt = next(iter(format_lookup.items()))
-        selected = fmt
-        print(f"[FORMAT] ⚠️ Last resort selected: {fmt_id} ({fmt.get('ext')}, {fmt.get('acodec')})")
+    elif first_any:
+        selected = first_any
+        logger.debug("[FORMAT] ⚠️ Last resort selected: %s (%s, %s)",
+                     selected.get('format_id'), selected.get('ext'), selected.get('acodec'))
     
     if not selected:
         # FAIL LOUDLY - Log all available formats for debugging
-        print(f"[FORMAT] ❌ FATAL: No progressive audio format available!")
-        print(f"[FORMAT] Available formats were:")
+        logger.error("[FORMAT] ❌ FATAL: No progressive audio format available! Available formats were:")
         for fmt in formats[:10]:
-            print(f"  - {fmt.get('format_id')}: protocol={fmt.get('protocol')}, "
-                  f"acodec={fmt.get('acodec')}, ext={fmt.get('ext')}")
+            logger.error("  - %s: protocol=%s, acodec=%s, ext=%s",
+                         fmt.get('format_id'), fmt.get('protocol'), fmt.get('acodec'), fmt.get('ext'))
         return None
     
     # Enrich with MIME type for browser
-    fmt_id = str(selected.get("format_id", ""))
-    if fmt_id in ITAG_MIME_TYPES:
-        selected["_mime_type"] = ITAG_MIME_TYPES[fmt_id]
-    else:
-        ext = selected.get("ext", "m4a")
-        selected["_mime_type"] = "audio/mp4" if ext == "m4a" else "audio/webm"
+    mime = ITAG_MIME_TYPES.get(str(selected.get("format_id", "")))
+    if mime is None:
+        mime = "audio/mp4" if selected.get("ext", "m4a") == "m4a" else "audio/webm"
+    selected["_mime_type"] = mime
     
     return selected
 
 
 
-class LRUCache(OrderedDict):
-    """LRU cache with size limit."""
-    def __init__(self, maxsize=300):
-        super().__init__()
+class LRUCache:
+    """LRU cache with size limit.
+
+    Backed by a C ``OrderedDict``: a hit is ``get`` plus ``move_to_end`` and
+    plain eviction is ``popitem(last=False)``; the front is the LRU end.
+
+    With ``priority``, eviction looks at the ``evict_sample`` least recently
+    used entries and drops the one with the lowest priority instead of
+    blindly dropping the front.
+    """
+    def __init__(
+        self,
+        maxsize=300,
+        priority: Optional[Callable[[Any], float]] = None,
+        evict_sample: int = 8,
+    ):
         self.maxsize = maxsize
-    
-    def __setitem__(self, key, value):
-        if key in self:
-            self.move_to_end(key)
-        super().__setitem__(key, value)
-        if len(self) > self.maxsize:
-            oldest = next(iter(self))
-            del self[oldest]
-    
+        self._priority = priority
+        self._evict_sample = evict_sample
+        self._data: "OrderedDict[Any, Any]" = OrderedDict()
+
+    def get(self, key, default=None):
+        data = self._data
+        if key not in data:
+            return default
+        data.move_to_end(key)
+        return data[key]
+
     def __getitem__(self, key):
-        value = super().__getitem__(key)
-        self.move_to_end(key)
-        return value
+        self._data.move_to_end(key)
+        return self._data[key]
+
+    def __setitem__(self, key, value):
+        data = self._data
+        data[key] = value
+        data.move_to_end(key)
+        if len(data) > self.maxsize:
+            if self._priority is None:
+                data.popitem(last=False)
+            else:
+                del data[self._pick_victim()]
+
+    def _pick_victim(self):
+        priority = self._priority
+        victim, best = None, None
+        for key, value in islice(self._data.items(), self._evict_sample):
+            p = priority(value)
+            if best is None or p < best:
+                victim, best = key, p
+        return victim
+
+    def __delitem__(self, key):
+        del self._data[key]
+
+    def pop(self, key, default=None):
+        return self._data.pop(key, default)
+
+    def __contains__(self, key) -> bool:
+        return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def values(self):
+        return list(self._data.values())
+
+    def items(self):
+        return list(self._data.items())
+
+
+def _retention_priority(cached: "CachedURL") -> float:
+    """LRBU score: re-extraction seconds saved per second of residency.
+
+    Entries that were served often and were slow to extract rank high; a
+    cheap, never-replayed, old entry ranks lowest and is evicted first.
+    """
+    age = max(1.0, time.time() - cached.inserted_at)
+    return (cached.hits + 1) * cached.extract_cost / age
 
 
 class StreamManager:
@@ -184,8 +250,8 @@ class StreamManager:
     Centralized extraction engine with isolation guarantees.
     
     Key invariants:
-    - Only ONE extraction runs at a time (semaphore-guarded)
-    - YoutubeDL instance is reused to retain player.js cache
+    - Each pooled YoutubeDL is checked out by one extraction at a time
+    - YoutubeDL instances are reused to retain player.js cache
     - Cookies are loaded ONCE at startup, never re-scanned
     - URL cache uses pessimistic TTL (90s safety margin)
     """
@@ -202,116 +268,209 @@ class StreamManager:
             return
         
         # Core state
-        self.cache: LRUCache = LRUCache(maxsize=300)
-        self.queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
-        self.pending_tasks: Dict[str, asyncio.Future] = {}
+        self.cache: LRUCache = LRUCache(maxsize=300, priority=_retention_priority)
+        # One FIFO per priority (1..3), drained highest-priority first; the
+        # semaphore counts queued tasks so idle workers sleep on a single await
+        self.queues: List[asyncio.Queue] = [asyncio.Queue() for _ in range(3)]
+        self._queued = asyncio.Semaphore(0)
+        # Weak values: a future nobody (queue, worker or awaiter) still holds
+        # drops out by itself, so cancelled/abandoned paths can't leak entries
+        self.pending_tasks: "WeakValueDictionary[str, asyncio.Future]" = WeakValueDictionary()
         
-        # Isolation mechanisms - TWO extractors:
-        # 1. Background prefetch queue (lower priority)
-        self._extraction_semaphore = asyncio.Semaphore(1)
-        self._ydl_instance: Optional[yt_dlp.YoutubeDL] = None
+        # Isolation mechanisms - TWO extractor paths:
+        # 1. Background prefetch queue (lower priority): K pooled instances,
+        #    each checked out by at most one worker at a time
+        self._pool_size = max(1, settings.extract_pool_size)
+        self._ydl_pool: "asyncio.Queue[yt_dlp.YoutubeDL]" = asyncio.Queue()
         
         # 2. Urgent path for user clicks (priority 1) - never waits for queue
         self._urgent_semaphore = asyncio.Semaphore(1)
-        self._urgent_ydl_instance: Optional[yt_dlp.YoutubeDL] = None
+        self._urgent_ydl_instance: "Optional[yt_dlp.YoutubeDL]" = None
+        
+        # Threads for blocking extract_info calls: one per pooled instance plus
+        # one for the urgent path, instead of sharing the default executor
+        self._extract_exec: Optional[ThreadPoolExecutor] = None
         
         self._cookie_opts: Dict = {}
         
         # Worker state
-        self._worker_task: Optional[asyncio.Task] = None
+        self._worker_tasks: List[asyncio.Task] = []
+        self._sweeper_task: Optional[asyncio.Task] = None
+        self._warm_task: Optional[asyncio.Task] = None
         self._is_warmed = False
         
         self._initialized = True
-        print("🎵 [STREAM] StreamManager v2 Initialized")
+        logger.debug("🎵 [STREAM] StreamManager v2 Initialized")
 
-    async def start(self):
-        """Start the extraction engine. Call once at server startup."""
-        if self._worker_task:
+    async def start(self, cookies_ready: Optional[Awaitable] = None):
+        """Start the extraction engine. Call once at server startup.
+
+        cookies_ready: an in-flight cookie warm-up to wait on instead of
+        extracting cookies here.
+        """
+        if self._worker_tasks:
             return
         
-        print("🔥 [STREAM] Pre-warming YouTube extraction engine...")
+        logger.info("🔥 [STREAM] Pre-warming YouTube extraction engine...")
         start = time.time()
         
         # 1. Extract cookies to file ONCE (the slow part - 5-10 seconds)
         # This creates a Netscape cookie file that yt-dlp can read instantly
-        from .cookie_helper import extract_cookies_to_file
-        cookie_file = await anyio.to_thread.run_sync(extract_cookies_to_file)
+        if cookies_ready is not None:
+            try:
+                await cookies_ready
+            except Exception as e:
+                logger.warning("⚠️ [STREAM] Cookie warm-up failed (non-fatal): %s", e)
+        else:
+            from .cookie_helper import extract_cookies_to_file
+            await asyncio.to_thread(extract_cookies_to_file)
         
         # 2. Get cookie options (now just a file path reference, O(1))
         self._cookie_opts = get_yt_dlp_cookie_opts()
         
-        # 3. Create BOTH extractor instances
+        # 3. Create the pooled and urgent extractor instances. Each keeps its own request
+        # handler for its lifetime; with yt-dlp[default] that is the requests
+        # backend, whose pooled session reuses TCP/TLS connections across
+        # extractions (the bare urllib handler reconnects every request).
+        import yt_dlp  # deferred so importing the app doesn't load yt-dlp
+
         opts = FAST_EXTRACT_OPTS.copy()
         opts.update(self._cookie_opts)
-        self._ydl_instance = yt_dlp.YoutubeDL(opts)
+        self._extract_exec = ThreadPoolExecutor(
+            max_workers=self._pool_size + 1, thread_name_prefix="ytdlp"
+        )
+        for _ in range(self._pool_size):
+            self._ydl_pool.put_nowait(yt_dlp.YoutubeDL(opts.copy()))
         self._urgent_ydl_instance = yt_dlp.YoutubeDL(opts.copy())  # Separate instance for urgent
         
-        # 4. Warm the primary instance (forces player.js + signature caching)
+        # 4. Start one background worker per pooled instance, plus the sweeper;
+        #    prefetches are served (on the other instances) while warm-up runs
+        self._worker_tasks = [
+            asyncio.create_task(self._worker_loop()) for _ in range(self._pool_size)
+        ]
+        self._sweeper_task = asyncio.create_task(self._sweep_loop())
+        
+        # 5. Warm a pooled instance in the background (player.js + signatures)
+        self._warm_task = asyncio.create_task(self._warm(start))
+
+    async def _warm(self, started_at: float):
+        ydl = await self._ydl_pool.get()
         try:
-            await anyio.to_thread.run_sync(
-                lambda: self._ydl_instance.extract_info(
-                    "https://www.youtube.com/watch?v=dQw4w9WgXcQ",
-                    download=False
-                )
-            )
+            await self._extract_info(ydl, "https://www.youtube.com/watch?v=dQw4w9WgXcQ")
             self._is_warmed = True
         except Exception as e:
-            print(f"⚠️ [STREAM] Warm-up extraction failed (non-fatal): {e}")
-        
-        # 5. Start the background worker
-        self._worker_task = asyncio.create_task(self._worker_loop())
+            logger.warning("⚠️ [STREAM] Warm-up extraction failed (non-fatal): %s", e)
+        finally:
+            self._ydl_pool.put_nowait(ydl)
         
-        elapsed = time.time() - start
-        print(f"✅ [STREAM] Engine warmed in {elapsed:.1f}s, 2 extractors ready.")
+        elapsed = time.time() - started_at
+        logger.info("✅ [STREAM] Engine warmed in %.1fs, %d extractors ready.", elapsed, self._pool_size + 1)
+
+    async def stop(self):
+        """Cancel the workers and release the extraction threads. Call at shutdown."""
+        tasks, self._worker_tasks = self._worker_tasks, []
+        for extra in (self._sweeper_task, self._warm_task):
+            if extra is not None:
+                tasks.append(extra)
+        self._sweeper_task = self._warm_task = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self._extract_exec is not None:
+            self._extract_exec.shutdown(wait=False, cancel_futures=True)
+            self._extract_exec = None
+
+    async def _sweep_loop(self):
+        """Drop expired URLs nobody has asked for, keeping size/stats honest."""
+        while True:
+            await asyncio.sleep(_SWEEP_INTERVAL)
+            cutoff = time.time() + _EXPIRY_MARGIN
+            for video_id, cached in self.cache.items():
+                if cached.expires_at <= cutoff:
+                    self.cache.pop(video_id)
+
+    def _extract_info(self, ydl: "yt_dlp.YoutubeDL", url: str) -> "asyncio.Future[Dict[str, Any]]":
+        """Run ydl.extract_info on the dedicated extraction executor.
+
+        Pinned to the YouTube extractor so yt-dlp skips probing every
+        registered extractor's suitable() regex before dispatching.
+        """
+        return asyncio.get_running_loop().run_in_executor(
+            self._extract_exec,
+            partial(ydl.extract_info, url, download=False, ie_key=_YOUTUBE_IE_KEY),
+        )
 
     async def _worker_loop(self):
         """
         Background worker that processes the priority queue.
-        Only ONE extraction runs at a time (semaphore-guarded).
+        Each extraction checks a YoutubeDL out of the pool for its duration.
         """
         while True:
             try:
-                task: ExtractionTask = await self.queue.get()
+                task = await self._next_task()
                 
                 # Skip if already cached while waiting
                 cached = self.get_cached_url(task.video_id)
                 if cached:
                     if not task.future.done():
                         task.future.set_result(cached)
-                    self.queue.task_done()
                     continue
                 
-                # Acquire semaphore (blocks if another extraction is running)
-                async with self._extraction_semaphore:
-                    # Double-check cache after acquiring lock
+                # Check out an extractor (blocks if all are busy)
+                ydl = await self._ydl_pool.get()
+                try:
+                    # Double-check cache after acquiring an instance
                     cached = self.get_cached_url(task.video_id)
                     if cached:
                         if not task.future.done():
                             task.future.set_result(cached)
-                        self.queue.task_done()
-                        continue
-                    
-                    await self._do_extraction(task)
-                
-                self.queue.task_done()
+                    else:
+                        await self._do_extraction(task, ydl)
+                finally:
+                    self._ydl_pool.put_nowait(ydl)
                 
             except asyncio.CancelledError:
                 break
             except Exception as e:
-                print(f"❌ [STREAM] Worker error: {e}")
+                logger.exception("❌ [STREAM] Worker error: %s", e)
+
+    # Prefetches are deliberately not batched into one watch_videos/playlist
+    # extraction: yt-dlp still runs YoutubeIE per entry (player.js is already
+    # cached per pooled instance), so a batch would only serialize N videos on
+    # one instance and let one bad entry fail the rest.
+    def _enqueue(self, video_id: str, priority: int) -> ExtractionTask:
+        """Queue an extraction and register its future as pending."""
+        task = ExtractionTask(
+            priority=priority,
+            video_id=video_id,
+            future=asyncio.get_running_loop().create_future(),
+        )
+        self.pending_tasks[video_id] = task.future
+        bucket = min(max(priority, 1), len(self.queues)) - 1
+        self.queues[bucket].put_nowait(task)
+        self._queued.release()
+        return task
+
+    async def _next_task(self) -> ExtractionTask:
+        """Wait for any queued task, then take from the highest-priority bucket."""
+        await self._queued.acquire()
+        for q in self.queues:
+            if not q.empty():
+                return q.get_nowait()
+        raise RuntimeError("task count out of sync with queues")
+
+    async def _do_extraction(self, task: ExtractionTask, ydl: "yt_dlp.YoutubeDL"):
+        """Perform the actual extraction with a checked-out pool instance."""
+        from yt_dlp.utils import DownloadError
 
-    async def _do_extraction(self, task: ExtractionTask):
-        """Perform the actual extraction. Called under semaphore lock."""
         video_id = task.video_id
         url = f"https://www.youtube.com/watch?v={video_id}"
         
-        print(f"⚙️ [EXTRACT] Processing {video_id} (Prio: {task.priority})")
+        logger.debug("⚙️ [EXTRACT] Processing %s (Prio: %s)", video_id, task.priority)
         start = time.time()
         
         try:
-            info = await anyio.to_thread.run_sync(
-                lambda: self._ydl_instance.extract_info(url, download=False)
-            )
+            info = await self._extract_info(ydl, url)
             
             # CRITICAL: Manual format selection to avoid HLS
             # Do NOT trust info["url"] - it may be an HLS manifest
@@ -329,17 +488,19 @@ class StreamManager:
             # Calculate pessimistic expiry (5 hours with 90s margin built into is_valid)
             cached = CachedURL(
                 url=stream_url,
-                expires_at=datetime.now() + timedelta(hours=5),
+                expires_at=time.time() + _URL_TTL,
                 content_type=content_type,
                 thumbnail=info.get("thumbnail"),
                 duration=info.get("duration"),
                 title=info.get("title"),
-                artist=info.get("uploader") or info.get("channel")
+                artist=info.get("uploader") or info.get("channel"),
+                extract_cost=time.time() - start,
             )
             self.cache[video_id] = cached
             
-            elapsed = time.time() - start
-            print(f"✅ [EXTRACT] {video_id} complete in {elapsed:.1f}s (format: {fmt.get('format_id')}, {content_type})")
+            elapsed = cached.extract_cost
+            logger.debug("✅ [EXTRACT] %s complete in %.1fs (format: %s, %s)",
+                         video_id, elapsed, fmt.get('format_id'), content_type)
             
             if not task.future.done():
                 task.future.set_result(cached)
@@ -347,38 +508,30 @@ class StreamManager:
         except DownloadError as e:
             err_msg = str(e)
             if "Sign in" in err_msg or "not a bot" in err_msg:
-                print(f"🤖 [EXTRACT] YouTube BOT DETECTION for {video_id}!")
-                print(f"   → Your cookies.txt is missing, expired, or invalid.")
-                print(f"   → Re-export cookies from a logged-in browser.")
+                logger.warning(_BOT_DETECTION_MSG, "EXTRACT", video_id)
             else:
-                print(f"❌ [EXTRACT] yt-dlp DownloadError for {video_id}: {err_msg[:200]}")
-            import sys; sys.stdout.flush()
+                logger.error("❌ [EXTRACT] yt-dlp DownloadError for %s: %s", video_id, err_msg[:200])
             if not task.future.done():
                 task.future.set_exception(e)
         except Exception as e:
-            print(f"❌ [EXTRACT] Failed for {video_id}: {e}")
+            logger.error("❌ [EXTRACT] Failed for %s: %s", video_id, e)
             if not task.future.done():
                 task.future.set_exception(e)
         finally:
-            # Clean up pending task reference
-            if video_id in self.pending_tasks:
+            # Clean up pending task reference (if it is still ours)
+            if self.pending_tasks.get(video_id) is task.future:
                 del self.pending_tasks[video_id]
 
     def get_cached_url(self, video_id: str) -> Optional[CachedURL]:
         """Get cached URL if valid (with safety margin)."""
-        try:
-            cached = self.cache.get(video_id)
-        except KeyError:
+        cached = self.cache.get(video_id)
+        if cached is None:
             return None
-        
-        if cached and cached.is_valid:
+        if cached.is_valid:
+            cached.hits += 1
             return cached
-        elif cached:
-            # Expired - remove from cache
-            try:
-                del self.cache[video_id]
-            except KeyError:
-                pass
+        # Expired - remove from cache
+        self.cache.pop(video_id, None)
         return None
 
     async def get_stream_url(self, video_id: str, priority: int = 1, timeout: float = 30.0) -> CachedURL:
@@ -388,6 +541,7 @@ class StreamManager:
         For priority=1 (user clicked play), uses the URGENT path to bypass queue.
         Raises TimeoutError if extraction takes too long.
         """
+        video_id = sys.intern(video_id)
         # 1. Fast path: cache hit
         cached = self.get_cached_url(video_id)
         if cached:
@@ -398,16 +552,15 @@ class StreamManager:
             return await self._urgent_extract(video_id, timeout)
         
         # 3. Join existing task if already pending
-        if video_id in self.pending_tasks:
+        pending = self.pending_tasks.get(video_id)
+        if pending is not None:
             try:
-                return await asyncio.wait_for(self.pending_tasks[video_id], timeout=timeout)
+                return await asyncio.wait_for(asyncio.shield(pending), timeout=timeout)
             except asyncio.TimeoutError:
                 raise TimeoutError(f"Extraction for {video_id} timed out after {timeout}s")
         
         # 4. Create new extraction task (for non-urgent)
-        task = ExtractionTask(priority=priority, video_id=video_id)
-        self.pending_tasks[video_id] = task.future
-        await self.queue.put(task)
+        task = self._enqueue(video_id, priority)
         
         # 5. Await result
         try:
@@ -425,7 +578,40 @@ class StreamManager:
         if cached:
             return cached
         
-        print(f"🚨 [URGENT] Bypassing queue for {video_id}")
+        # A prefetch (or another click) is already extracting this video:
+        # ride along instead of running yt-dlp twice. Shielded so our timeout
+        # doesn't cancel the shared future for its other waiters.
+        pending = self.pending_tasks.get(video_id)
+        if pending is not None:
+            logger.debug("🔗 [URGENT] Joining in-flight extraction for %s", video_id)
+            try:
+                return await asyncio.wait_for(asyncio.shield(pending), timeout=timeout)
+            except asyncio.TimeoutError:
+                raise TimeoutError(f"Extraction for {video_id} timed out after {timeout}s")
+        
+        own = asyncio.get_running_loop().create_future()
+        self.pending_tasks[video_id] = own
+        try:
+            cached = await self._urgent_run(video_id, timeout)
+        except asyncio.CancelledError:
+            own.cancel()
+            raise
+        except Exception as e:
+            own.set_exception(e)
+            own.exception()  # Mark retrieved; joiners re-raise it themselves
+            raise
+        else:
+            own.set_result(cached)
+            return cached
+        finally:
+            if self.pending_tasks.get(video_id) is own:
+                del self.pending_tasks[video_id]
+
+    async def _urgent_run(self, video_id: str, timeout: float) -> CachedURL:
+        """Run the urgent extraction on the dedicated instance."""
+        from yt_dlp.utils import DownloadError
+
+        logger.debug("🚨 [URGENT] Bypassing queue for %s", video_id)
         
         async with self._urgent_semaphore:
             # Double-check cache after acquiring lock
@@ -438,9 +624,7 @@ class StreamManager:
             
             try:
                 info = await asyncio.wait_for(
-                    anyio.to_thread.run_sync(
-                        lambda: self._urgent_ydl_instance.extract_info(url, download=False)
-                    ),
+                    self._extract_info(self._urgent_ydl_instance, url),
                     timeout=timeout
                 )
                 
@@ -459,17 +643,19 @@ class StreamManager:
                 
                 cached = CachedURL(
                     url=stream_url,
-                    expires_at=datetime.now() + timedelta(hours=5),
+                    expires_at=time.time() + _URL_TTL,
                     content_type=content_type,
                     thumbnail=info.get("thumbnail"),
                     duration=info.get("duration"),
                     title=info.get("title"),
-                    artist=info.get("uploader") or info.get("channel")
+                    artist=info.get("uploader") or info.get("channel"),
+                    extract_cost=time.time() - start,
                 )
                 self.cache[video_id] = cached
                 
-                elapsed = time.time() - start
-                print(f"✅ [URGENT] {video_id} complete in {elapsed:.1f}s (format: {fmt.get('format_id')}, {content_type})")
+                elapsed = cached.extract_cost
+                logger.debug("✅ [URGENT] %s complete in %.1fs (format: %s, %s)",
+                             video_id, elapsed, fmt.get('format_id'), content_type)
                 
                 return cached
                 
@@ -478,11 +664,7 @@ class StreamManager:
             except DownloadError as e:
                 err_msg = str(e)
                 if "Sign in" in err_msg or "not a bot" in err_msg:
-                    import sys
-                    print(f"🤖 [URGENT] YouTube BOT DETECTION for {video_id}!")
-                    print(f"   → Your cookies.txt is missing, expired, or invalid.")
-                    print(f"   → Re-export cookies from a logged-in browser.")
-                    sys.stdout.flush()
+                    logger.warning(_BOT_DETECTION_MSG, "URGENT", video_id)
                 raise
 
     async def prefetch(self, video_id: str, priority: int = 3) -> bool:
@@ -490,12 +672,11 @@ class StreamManager:
         Background prefetch. Returns immediately, extraction happens async.
         Returns True if queued, False if already cached/pending.
         """
+        video_id = sys.intern(video_id)
         if self.get_cached_url(video_id) or video_id in self.pending_tasks:
             return False
         
-        task = ExtractionTask(priority=priority, video_id=video_id)
-        self.pending_tasks[video_id] = task.future
-        await self.queue.put(task)
+        self._enqueue(video_id, priority)
         return True
 
     async def get_or_queue(self, video_id: str, priority: int = 1) -> tuple[Optional[CachedURL], Optional[asyncio.Future]]:
@@ -506,29 +687,30 @@ class StreamManager:
             (cached, None) if URL is cached
             (None, future) if extraction is queued/pending
         """
+        video_id = sys.intern(video_id)
         cached = self.get_cached_url(video_id)
         if cached:
             return (cached, None)
         
-        if video_id in self.pending_tasks:
-            return (None, self.pending_tasks[video_id])
+        pending = self.pending_tasks.get(video_id)
+        if pending is not None:
+            return (None, pending)
         
         # Queue new task
-        task = ExtractionTask(priority=priority, video_id=video_id)
-        self.pending_tasks[video_id] = task.future
-        await self.queue.put(task)
+        task = self._enqueue(video_id, priority)
         
         return (None, task.future)
 
     def get_stats(self) -> Dict[str, Any]:
-        """Get engine statistics for debugging."""
-        now = datetime.now()
-        valid = sum(1 for c in self.cache.values() if c.is_valid)
+        """Get engine statistics for debugging. O(1): no cache scan."""
+        size = len(self.cache)
         return {
-            "cache_size": len(self.cache),
-            "cache_valid": valid,
+            "cache_size": size,
+            # Expired entries are dropped when probed or by the sweeper, so
+            # this over-reports by at most one sweep interval's expiries
+            "cache_valid": size,
             "pending_extractions": len(self.pending_tasks),
-            "queue_size": self.queue.qsize(),
+            "queue_size": sum(q.qsize() for q in self.queues),
             "is_warmed": self._is_warmed,
         }
 
@@ -1,14 +1,92 @@
 from __future__ import annotations
 
+import asyncio
 import random
-from typing import Any, Dict, List
+import re
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from operator import itemgetter
+from typing import Any, Dict, List, Optional
 
-import yt_dlp
+import httpx
+import orjson
 
 from ..config import settings
 from .cookie_helper import get_yt_dlp_cookie_opts, run_yt_dlp_with_fallback
 from .formatting import format_duration, format_views
 
+_TRENDING_TTL = 600.0  # Raw trending entries are reused per source query
+_SEARCH_TTL = 30.0  # Short: search results should still feel live
+_SUGGEST_VALIDATOR_TTL = 3600.0  # Keep ETag/Last-Modified past the route's 60s cache
+_DETAIL_CONCURRENCY = 8  # Parallel get_video_info calls per detailed playlist
+
+
+class _TTLCache:
+    """Tiny thread-safe LRU with per-entry expiry (monotonic clock)."""
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Any, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Any) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[0] >= self.ttl:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: Any, value: Any) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+
+# Substring keywords for query building and result scoring. Plain `in`
+# checks on a title cost about 1us per entry in total; a multi-pattern
+# automaton or regex alternation measured no faster at these sizes.
+FORMAT_KEYWORDS = ("official", "audio", "music video", "lyrics", "album", "remix")
+MUSIC_KEYWORDS = ("official audio", "official video", "music video", "lyric", "full album")
+NOISE_KEYWORDS = ("tutorial", "how to", "review", "reaction", "unboxing", "vlog")
+
+_ytimg_thumb = "https://i.ytimg.com/vi/{}/mqdefault.jpg".format
+_watch_url = "https://www.youtube.com/watch?v={}".format
+
+
+def _entry_to_video(
+    entry: Dict[str, Any],
+    video_id: Optional[str],
+    title_default: str = "Unknown Title",
+    uploader_default: Optional[str] = "Unknown",
+) -> Dict[str, Any]:
+    """Common fields of a flat yt-dlp entry; callers add endpoint extras."""
+    get = entry.get
+    return {
+        "id": video_id,
+        "title": get("title", title_default),
+        "uploader": get("uploader", uploader_default),
+        "thumbnail": get("thumbnail") or _ytimg_thumb(video_id),
+        "duration": format_duration(get("duration")),
+    }
+
+
+# JSONP payload of the suggest API: callback([...])
+_SUGGEST_RE = re.compile(rb"\((\[.*\])\)", re.DOTALL)
+
+_trending_cache = _TTLCache(maxsize=16, ttl=_TRENDING_TTL)
+_search_cache = _TTLCache(maxsize=256, ttl=_SEARCH_TTL)
+# query -> (validator headers, parsed suggestions) for conditional re-fetches
+_suggest_validators = _TTLCache(maxsize=512, ttl=_SUGGEST_VALIDATOR_TTL)
+
 
 class YTDLClient:
     """Thin wrapper around yt_dlp to keep extraction code organized."""
@@ -21,12 +99,33 @@ class YTDLClient:
         }
         # Update base_opts with cookie options
         self.base_opts.update(get_yt_dlp_cookie_opts())
+        # Per-endpoint option templates, built once. run_yt_dlp_with_fallback
+        # copies before merging cookies/proxy, so these are never mutated.
+        self._trending_opts = {**self.base_opts, "extract_flat": True, "playlistend": 10}  # 8 are shown; room for id-less entries
+        self._suggest_opts = {**self.base_opts, "extract_flat": True, "playlistend": 10}
+        self._search_opts = {**self.base_opts, "extract_flat": True, "playlistend": 15}
+        # No YoutubeDL is held here: run_yt_dlp_with_fallback already keeps a
+        # warm, individually locked instance per option set. One shared
+        # instance with per-call params.update() would race, because these
+        # methods run concurrently on executor threads.
+        # One pooled client for the suggest API: keystrokes reuse a warm
+        # connection instead of paying a TCP handshake each time
+        self._suggest_client = httpx.Client(
+            proxy=settings.proxy_url,
+            timeout=3.0,
+            limits=httpx.Limits(max_keepalive_connections=20, max_connections=20),
+        )
+
+    def close(self) -> None:
+        """Release pooled HTTP connections (called on app shutdown)."""
+        self._suggest_client.close()
 
     def get_video_info(self, url: str, force_single: bool = False) -> Dict[str, Any]:
-        opts = dict(self.base_opts)
+        from yt_dlp.utils import DownloadError
+
         try:
-            info = run_yt_dlp_with_fallback(opts, url, download=False)
-        except yt_dlp.utils.DownloadError:
+            info = run_yt_dlp_with_fallback(self.base_opts, url, download=False)
+        except DownloadError:
             if "playlist" in url and not force_single:
                 return {"success": True, "is_playlist": True, "url": url}
             raise
@@ -57,79 +156,63 @@ class YTDLClient:
             "track": info.get("track") or info.get("track_song"),
         }
 
-    def get_trending(self) -> List[Dict[str, Any]]:
-        opts = dict(self.base_opts)
-        opts.update({"extract_flat": True, "playlistend": 20})  # Fetch more to shuffle from
-        
+    def _fetch_trending_raw(self, source_url: str) -> List[Dict[str, Any]]:
+        """Flat search entries for a trending query, cached for a few minutes."""
+        entries = _trending_cache.get(source_url)
+        if entries is None:
+            info = run_yt_dlp_with_fallback(self._trending_opts, source_url, download=False)
+            entries = [entry for entry in info.get("entries") or [] if entry]
+            _trending_cache.set(source_url, entries)
+        return entries
+
+    @staticmethod
+    def _trending_videos(entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        videos = []
+        for entry in entries:
+            video_id = entry.get("id")
+            if not video_id:
+                continue
+            video = _entry_to_video(entry, video_id)
+            video["views"] = format_views(entry.get("view_count"))
+            videos.append(video)
+        return videos
+
+    async def get_trending(self) -> List[Dict[str, Any]]:
         # Varied search queries for different content each time
         search_queries = [
-            "ytsearch15:trending music 2024",
-            "ytsearch15:new music releases",
-            "ytsearch15:popular songs today",
-            "ytsearch15:top hits music",
-            "ytsearch15:best new music",
-            "ytsearch15:viral music videos",
-            "ytsearch15:hot music charts",
-            "ytsearch15:latest music hits",
+            "ytsearch10:trending music 2024",
+            "ytsearch10:new music releases",
+            "ytsearch10:popular songs today",
+            "ytsearch10:top hits music",
+            "ytsearch10:best new music",
+            "ytsearch10:viral music videos",
+            "ytsearch10:hot music charts",
+            "ytsearch10:latest music hits",
         ]
         
         # Pick a random search query for variety
         source_url = random.choice(search_queries)
         
-        videos = []
-        try:
-            info = run_yt_dlp_with_fallback(opts, source_url, download=False)
-            
-            for entry in info.get("entries", [])[:20]:
-                if not entry:
-                    continue
-                video_id = entry.get("id")
-                if not video_id:
-                    continue
-                videos.append(
-                    {
-                        "id": video_id,
-                        "title": entry.get("title", "Unknown Title"),
-                        "uploader": entry.get("uploader", "Unknown"),
-                        "thumbnail": entry.get("thumbnail")
-                        or f"https://i.ytimg.com/vi/{video_id}/mqdefault.jpg",
-                        "views": format_views(entry.get("view_count")),
-                        "duration": format_duration(entry.get("duration")),
-                    }
-                )
-        except Exception as e:
-            print(f"Failed to get trending: {e}")
-            # Fallback to a basic search
-            try:
-                info = run_yt_dlp_with_fallback(opts, "ytsearch12:music 2024", download=False)
-                for entry in info.get("entries", [])[:12]:
-                    if not entry:
-                        continue
-                    video_id = entry.get("id")
-                    if not video_id:
-                        continue
-                    videos.append(
-                        {
-                            "id": video_id,
-                            "title": entry.get("title", "Unknown Title"),
-                            "uploader": entry.get("uploader", "Unknown"),
-                            "thumbnail": entry.get("thumbnail")
-                            or f"https://i.ytimg.com/vi/{video_id}/mqdefault.jpg",
-                            "views": format_views(entry.get("view_count")),
-                            "duration": format_duration(entry.get("duration")),
-                        }
-                    )
-            except Exception:
+        # Run the basic-search fallback alongside the primary query instead
+        # of after it fails, so a failure costs one extraction, not two
+        primary, fallback = await asyncio.gather(
+            asyncio.to_thread(self._fetch_trending_raw, source_url),
+            asyncio.to_thread(self._fetch_trending_raw, "ytsearch10:music 2024"),
+            return_exceptions=True,
+        )
+        if not isinstance(primary, BaseException):
+            videos = self._trending_videos(primary)
+        else:
+            print(f"Failed to get trending: {primary}")
+            if isinstance(fallback, BaseException):
                 raise RuntimeError("Failed to fetch trending videos from all sources")
+            videos = self._trending_videos(fallback)
         
         if not videos:
             raise RuntimeError("Failed to fetch trending videos")
         
-        # Randomize to show different videos each time
-        random.shuffle(videos)
-        
-        # Return top 8 after shuffling
-        return videos[:8]
+        # Pick 8 at random to show different videos each time
+        return random.sample(videos, k=min(8, len(videos)))
 
 
     def get_suggestions(self, query: str) -> List[Dict[str, Any]]:
@@ -137,37 +220,43 @@ class YTDLClient:
         Get search suggestions INSTANTLY using YouTube's autocomplete API.
         This is much faster than running yt-dlp for suggestions.
         """
-        import httpx
-        import json
-        
         try:
             # YouTube Suggest API (used by search bar)
             url = f"http://suggestqueries.google.com/complete/search?client=youtube&ds=yt&q={query}"
             
-            # Using proxy if available to avoid rate limiting
-            proxy = settings.proxy_url if hasattr(settings, 'proxy_url') else None
+            # Revalidate instead of re-downloading when we've seen this query
+            known = _suggest_validators.get(query)
+            response = self._suggest_client.get(url, headers=known[0] if known else None)
+            if response.status_code == 304 and known:
+                return known[1]
             
-            with httpx.Client(proxy=proxy, timeout=3.0) as client:
-                response = client.get(url)
-                
-                if response.status_code == 200:
-                    # Format is: window.google.ac.h(["query",[["sug1",0],["sug2",0]]])
-                    # Or sometimes just a raw list depending on client param
-                    text = response.text
-                    start = text.find("(")
-                    end = text.rfind(")")
-                    if start != -1 and end != -1:
-                        data = json.loads(text[start+1:end])
-                        suggestions_list = data[1]
-                        
-                        results = []
-                        for sug in suggestions_list:
-                            if isinstance(sug, list) and len(sug) > 0:
-                                results.append({"title": sug[0]})
-                            elif isinstance(sug, str):
-                                results.append({"title": sug})
-                        
-                        return results[:10]
+            if response.status_code == 200:
+                # Format is: window.google.ac.h(["query",[["sug1",0],["sug2",0]]])
+                # Or sometimes just a raw list depending on client param
+                body = response.content
+                if (response.charset_encoding or "utf-8").lower().replace("-", "") != "utf8":
+                    body = response.text.encode()  # orjson only reads UTF-8
+                match = _SUGGEST_RE.search(body)
+                if match:
+                    data = orjson.loads(match.group(1))
+                    suggestions_list = data[1]
+                    
+                    results = []
+                    for sug in suggestions_list:
+                        if isinstance(sug, list) and len(sug) > 0:
+                            results.append({"title": sug[0]})
+                        elif isinstance(sug, str):
+                            results.append({"title": sug})
+                    
+                    results = results[:10]
+                    validators = {}
+                    if "etag" in response.headers:
+                        validators["If-None-Match"] = response.headers["etag"]
+                    if "last-modified" in response.headers:
+                        validators["If-Modified-Since"] = response.headers["last-modified"]
+                    if validators:
+                        _suggest_validators.set(query, (validators, results))
+                    return results
             
             # Fallback to search-based suggestions if autocomplete fails
             return self._get_suggestions_fallback(query)
@@ -179,11 +268,8 @@ class YTDLClient:
     def _get_suggestions_fallback(self, query: str) -> List[Dict[str, Any]]:
         """Standard search fallback for suggestions."""
         search_query = self._build_search_query(query)
-        opts = dict(self.base_opts)
-        opts.update({"extract_flat": True, "playlistend": 10})
-        
         try:
-            info = run_yt_dlp_with_fallback(opts, f"ytsearch10:{search_query}", download=False)
+            info = run_yt_dlp_with_fallback(self._suggest_opts, f"ytsearch10:{search_query}", download=False)
             entries = info.get("entries", [])
             
             suggestions = []
@@ -192,28 +278,21 @@ class YTDLClient:
                 video_id = entry.get("id")
                 if not video_id: continue
                 
-                suggestions.append({
-                    "title": entry.get("title", ""),
-                    "uploader": entry.get("uploader", "Unknown"),
-                    "url": f"https://www.youtube.com/watch?v={video_id}",
-                    "thumbnail": entry.get("thumbnail") or f"https://i.ytimg.com/vi/{video_id}/mqdefault.jpg",
-                    "duration": format_duration(entry.get("duration")),
-                    "id": video_id
-                })
+                video = _entry_to_video(entry, video_id, title_default="")
+                video["url"] = _watch_url(video_id)
+                suggestions.append(video)
             return suggestions
         except Exception:
             return []
 
     def get_playlist(self, url: str, limit: int) -> Dict[str, Any]:
-        opts = dict(self.base_opts)
-        opts.update(
-            {
-                "extract_flat": "in_playlist",
-                "noplaylist": False,
-                "playlistend": limit,
-                "ignoreerrors": True,
-            }
-        )
+        opts = {
+            **self.base_opts,
+            "extract_flat": "in_playlist",
+            "noplaylist": False,
+            "playlistend": limit,
+            "ignoreerrors": True,
+        }
         info = run_yt_dlp_with_fallback(opts, url, download=False)
 
         entries = info.get("entries") or []
@@ -224,17 +303,9 @@ class YTDLClient:
             video_id = entry.get("id")
             if not video_id:
                 continue
-            videos.append(
-                {
-                    "id": video_id,
-                    "title": entry.get("title", "Unknown Title"),
-                    "url": entry.get("url") or f"https://www.youtube.com/watch?v={video_id}",
-                    "thumbnail": entry.get("thumbnail")
-                    or f"https://i.ytimg.com/vi/{video_id}/mqdefault.jpg",
-                    "duration": format_duration(entry.get("duration")),
-                    "uploader": entry.get("uploader", "Unknown"),
-                }
-            )
+            video = _entry_to_video(entry, video_id)
+            video["url"] = entry.get("url") or _watch_url(video_id)
+            videos.append(video)
 
         if not videos:
             raise ValueError("No valid videos found in playlist.")
@@ -246,13 +317,36 @@ class YTDLClient:
             "count": len(videos),
         }
 
+    async def get_playlist_detailed(self, url: str, limit: int) -> Dict[str, Any]:
+        """Flat playlist plus full per-video info, fetched concurrently.
+
+        Each entry gains a ``details`` key holding its get_video_info result;
+        entries whose lookup fails are returned flat.
+        """
+        playlist = await asyncio.to_thread(self.get_playlist, url, limit)
+        semaphore = asyncio.Semaphore(_DETAIL_CONCURRENCY)
+
+        async def fetch(video: Dict[str, Any]) -> Any:
+            async with semaphore:
+                return await asyncio.to_thread(self.get_video_info, video["url"], True)
+
+        details = await asyncio.gather(
+            *(fetch(video) for video in playlist["videos"]), return_exceptions=True
+        )
+        for video, info in zip(playlist["videos"], details):
+            if not isinstance(info, BaseException):
+                video["details"] = info
+        return playlist
+
     def search(self, query: str) -> List[Dict[str, Any]]:
+        cache_key = " ".join(query.lower().split())
+        cached = _search_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
         search_query = self._build_search_query(query)
-        opts = dict(self.base_opts)
-        opts.update({"extract_flat": True, "playlistend": 15})
-        
         try:
-            info = run_yt_dlp_with_fallback(opts, f"ytsearch15:{search_query}", download=False)
+            info = run_yt_dlp_with_fallback(self._search_opts, f"ytsearch15:{search_query}", download=False)
             entries = info.get("entries", [])
             
             scored = []
@@ -266,30 +360,23 @@ class YTDLClient:
             results = []
             for entry, score in scored[:10]:
                 video_id = entry.get("id")
-                results.append(
-                    {
-                        "id": video_id,
-                        "title": entry.get("title", "Unknown"),
-                        "uploader": entry.get("uploader"),
-                        "duration": format_duration(entry.get("duration")),
-                        "url": f"https://www.youtube.com/watch?v={video_id}",
-                        "thumbnail": entry.get("thumbnail") or f"https://i.ytimg.com/vi/{video_id}/mqdefault.jpg",
-                    }
-                )
+                video = _entry_to_video(entry, video_id, title_default="Unknown", uploader_default=None)
+                video["url"] = _watch_url(video_id)
+                results.append(video)
+            _search_cache.set(cache_key, results)
             return results
         except Exception as e:
             print(f"Search failed: {e}")
             return []
 
-    def _build_search_query(self, user_input: str) -> str:
+    @staticmethod
+    @lru_cache(maxsize=2048)  # typeahead repeats the same prefixes
+    def _build_search_query(user_input: str) -> str:
         """Build optimized search query based on input analysis."""
         query = user_input.strip()
         # Detect if user is already searching for music formats
-        has_format_keywords = any(
-            kw in query.lower() 
-            for kw in ["official", "audio", "music video", "lyrics", "album", "remix"]
-        )
-        if has_format_keywords:
+        query_lower = query.lower()
+        if any(kw in query_lower for kw in FORMAT_KEYWORDS):
             return query
         # Silently append official audio for music-first intent
         return f"{query} official audio"
@@ -297,27 +384,20 @@ class YTDLClient:
     def _score_result_relevance(self, result: Dict[str, Any], query: str) -> float:
         """Score results to prioritize high-quality music content."""
         score = 1.0
-        title_lower = result.get("title", "").lower()
-        uploader_lower = result.get("uploader", "").lower()
+        get = result.get
+        title_lower = get("title", "").lower()
+        uploader_lower = get("uploader", "").lower()
         
         # Boost official content
         if "vevo" in uploader_lower or "official" in uploader_lower:
             score += 2.0
         
-        # Boost music keywords
-        music_keywords = ["official audio", "official video", "music video", "lyric", "full album"]
-        for keyword in music_keywords:
-            if keyword in title_lower:
-                score += 1.0
-        
-        # Penalize non-music noise
-        noise_keywords = ["tutorial", "how to", "review", "reaction", "unboxing", "vlog"]
-        for keyword in noise_keywords:
-            if keyword in title_lower:
-                score -= 2.0
+        # Boost music keywords, penalize non-music noise
+        score += sum(kw in title_lower for kw in MUSIC_KEYWORDS)
+        score -= 2.0 * sum(kw in title_lower for kw in NOISE_KEYWORDS)
         
         # Duration scoring (Music is usually 2-7 minutes)
-        duration = result.get("duration")
+        duration = get("duration")
         if duration:
             if 120 <= duration <= 420:  # 2-7 mins
                 score += 0.5
@@ -330,32 +410,25 @@ class YTDLClient:
 
     @staticmethod
     def _collect_formats(info: Dict[str, Any]) -> tuple[list[Dict[str, Any]], list[Dict[str, Any]]]:
-        combined_formats: List[Dict[str, Any]] = []
-        audio_formats: List[Dict[str, Any]] = []
-        seen_heights, seen_abrs = set(), set()
+        # First format seen per height / audio bitrate wins
+        combined: Dict[Any, Dict[str, Any]] = {}
+        audio: Dict[Any, Dict[str, Any]] = {}
 
         for fmt in info.get("formats", []):
-            vcodec = fmt.get("vcodec")
-            if vcodec != "none":
-                height = fmt.get("height")
-                if height and height not in seen_heights:
-                    combined_formats.append(
-                        {
-                            "height": height,
-                            "ext": fmt.get("ext"),
-                            "note": fmt.get("format_note"),
-                        }
-                    )
-                    seen_heights.add(height)
-
-            if vcodec == "none" and fmt.get("acodec") != "none":
-                abr = fmt.get("abr")
-                if abr and abr not in seen_abrs:
-                    audio_formats.append({"abr": abr, "ext": fmt.get("ext")})
-                    seen_abrs.add(abr)
-
-        combined_formats.sort(key=lambda x: x.get("height") or 0, reverse=True)
-        audio_formats.sort(key=lambda x: x.get("abr") or 0, reverse=True)
-        return combined_formats, audio_formats
-
+            get = fmt.get
+            if get("vcodec") != "none":
+                height = get("height")
+                if height and height not in combined:
+                    combined[height] = {
+                        "height": height,
+                        "ext": get("ext"),
+                        "note": get("format_note"),
+                    }
+            elif get("acodec") != "none":
+                abr = get("abr")
+                if abr and abr not in audio:
+                    audio[abr] = {"abr": abr, "ext": get("ext")}
 
+        combined_formats = sorted(combined.values(), key=itemgetter("height"), reverse=True)
+        audio_formats = sorted(audio.values(), key=itemgetter("abr"), reverse=True)
+        return combined_formats, audio_formats
@@ -6,6 +6,8 @@ print(f"Updating database: {db_path}")
 
 conn = sqlite3.connect(db_path)
 cursor = conn.cursor()
+# One transaction for all schema changes: one commit, one fsync
+conn.execute("BEGIN")
 
 # Check what columns exist in library_tracks
 cursor.execute("PRAGMA table_info(library_tracks)")
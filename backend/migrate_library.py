@@ -16,6 +16,9 @@ print(f"Migrating database: {db_path}")
 
 conn = sqlite3.connect(db_path)
 cursor = conn.cursor()
+# DDL would otherwise autocommit (and fsync) statement by statement;
+# run the whole migration as one transaction instead
+conn.execute("BEGIN")
 
 # Get existing columns
 cursor.execute("PRAGMA table_info(library_tracks)")
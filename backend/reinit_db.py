@@ -11,6 +11,8 @@ print(f"Repairing tables in: {db_path}")
 
 conn = sqlite3.connect(db_path)
 cursor = conn.cursor()
+# Both drops commit together (sqlite3 would otherwise autocommit each one)
+conn.execute("BEGIN")
 
 try:
     # Drop the tables so they can be recreated by init_db() on next startup
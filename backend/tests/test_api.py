@@ -1,25 +1,106 @@
+import asyncio
+import os
+from types import SimpleNamespace
+
+import pytest
 from fastapi.testclient import TestClient
 from app.main import app
+from app.database import get_db
+from app.routes import info
+
+_VIDEO = {"id": "dQw4w9WgXcQ", "title": "Test Track", "uploader": "Test"}
+
+
+@pytest.fixture(scope="session")
+def client():
+    # One client for the whole run; lifespan is not entered, same as before
+    return TestClient(app)
+
 
-client = TestClient(app)
+@pytest.fixture(autouse=True)
+def offline_yt(monkeypatch):
+    """Serve canned results instead of calling YouTube through yt-dlp."""
+    async def get_trending():
+        return [_VIDEO]
 
-def test_healthcheck():
+    monkeypatch.setattr(info.client, "get_trending", get_trending)
+    monkeypatch.setattr(info.client, "search", lambda query: [_VIDEO])
+    monkeypatch.setattr(
+        info.client, "get_video_info", lambda url, force_single=False: {"success": True, **_VIDEO}
+    )
+    monkeypatch.setitem(info._trending_cache, "data", None)
+
+def test_healthcheck(client):
     response = client.get("/healthz")
     assert response.status_code == 200
     assert response.json() == {"status": "ok"}
 
-def test_trending_endpoint_exists():
-    # We don't want to actually call YouTube in tests if possible, 
-    # but at least check if the route is registered and responds (even if it 500s due to no internet/yt-dlp issues in CI)
+def test_trending_endpoint_exists(client):
+    # YouTube is stubbed out above, so this only checks the route is
+    # registered and responds
     response = client.get("/api/trending")
-    # If internet is available and yt-dlp works, it might be 200.
     # For a basic test, we just ensure it's not a 404.
     assert response.status_code != 404
 
-def test_search_endpoint_exists():
+def test_search_endpoint_exists(client):
     response = client.post("/api/search", json={"query": "test"})
     assert response.status_code != 404
 
-def test_info_endpoint_exists():
+def test_info_endpoint_exists(client):
     response = client.post("/api/info", json={"url": "https://www.youtube.com/watch?v=dQw4w9WgXcQ"})
     assert response.status_code != 404
+
+
+def test_single_flight_survives_leader_cancellation():
+    from app.routes import streaming
+
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return "payload"
+
+    async def run():
+        leader = asyncio.create_task(streaming._single_flight("test:sf", fetch))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(streaming._single_flight("test:sf", fetch))
+        await asyncio.sleep(0.05)
+        leader.cancel()
+        return await asyncio.gather(leader, follower, return_exceptions=True)
+
+    leader_result, follower_result = asyncio.run(run())
+    assert isinstance(leader_result, asyncio.CancelledError)
+    assert follower_result == "payload"
+    assert calls == [1]
+    assert "test:sf" not in streaming._inflight
+
+
+def test_stream_track_conditional_get(client, tmp_path):
+    audio = tmp_path / "track.mp3"
+    audio.write_bytes(b"\x00" * 64)
+    track = SimpleNamespace(id=1, path=str(audio))
+
+    class FakeSession:
+        async def execute(self, _stmt):
+            return SimpleNamespace(scalar_one_or_none=lambda: track)
+
+    async def fake_db():
+        yield FakeSession()
+
+    app.dependency_overrides[get_db] = fake_db
+    try:
+        first = client.get("/api/streaming/track/1")
+        assert first.status_code == 200
+        etag = first.headers["etag"]
+
+        repeat = client.get("/api/streaming/track/1", headers={"If-None-Match": etag})
+        assert repeat.status_code == 304
+
+        st = audio.stat()
+        os.utime(audio, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+        changed = client.get("/api/streaming/track/1", headers={"If-None-Match": etag})
+        assert changed.status_code == 200
+        assert changed.headers["etag"] != etag
+    finally:
+        app.dependency_overrides.pop(get_db, None)